@@ -1,15 +1,18 @@
 import logging
-import os
 import json
-import sqlite3
 import src.utils as utils
 import src.Upgrade.upgrade_manager
+import src.Database.sqlite
+import src.Database.connection
+import src.Database.executor
 
 from datetime import datetime
 from functools import wraps
 
 from src.user_manager import UserManager, AdminUser
 from src.event_manager import AdminEventManager
+from src.bot_clients import get_bot, get_bot_tokens
+from src.broadcast import ProgressReporter
 
 from telegram import (
         Update,
@@ -19,7 +22,7 @@ from telegram import (
         ChatAction,
         MessageEntity,
         )
-from telegram.bot import Bot, BotCommand
+from telegram.bot import BotCommand
 from telegram.ext import (
         Updater,
         CommandHandler,
@@ -32,7 +35,6 @@ from telegram.ext import (
 
 with open("config.json") as f:
     CONFIG = json.load(f)
-    db = sqlite3.connect(CONFIG['database'], check_same_thread=False)
 
 # enable logging
 logging.basicConfig(
@@ -40,6 +42,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# runs db reads off the dispatcher thread, writes are serialized on one thread
+db_executor = src.Database.executor.get_executor()
+
 
 # typing wrapper
 def send_typing_action(func):
@@ -140,8 +145,9 @@ def reply_attendance_list(update: Update, context: CallbackContext) -> int:
 
     # retrieve selected event
     event_id = int(query.data)
-    event_instance = AdminEventManager(event_id, record_exist=True)
-    male_records, female_records, absentees, unindicated = event_instance.curate_attendance(attach_usernames=True)
+    with src.Database.sqlite.snapshot():
+        event_instance = AdminEventManager(event_id, record_exist=True)
+        male_records, female_records, absentees, unindicated = event_instance.curate_attendance(attach_usernames=True)
     total_attendees = len(male_records) + len(female_records)
     event_date = datetime.strptime(str(event_id), '%Y%m%d%H%M')
     pretty_event_date = event_date.strftime('%-d-%b-%y, %a @ %-I:%M%p')
@@ -290,16 +296,21 @@ def send_event_message(update: Update, context: CallbackContext) -> int:
     admin_msg.edit_text(
         "getting players...\n"
         )
-    send_list = event.compile_attendance_by_cat(
-            attendance=1,
-            gender='both',
-            access_cat='all'
-            )
-    send_list += event.compile_attendance_by_cat(
-            attendance=None,
-            gender='both',
-            access_cat="member"
+    attending, unindicated = db_executor.gather(
+            db_executor.read(
+                event.compile_attendance_by_cat,
+                attendance=1,
+                gender='both',
+                access_cat='all'
+                ),
+            db_executor.read(
+                event.compile_attendance_by_cat,
+                attendance=None,
+                gender='both',
+                access_cat="member"
+                ),
             )
+    send_list = attending + unindicated
 
     # #adding team managers
     # send_list += db.execute('SELECT * FROM players JOIN access_control ON players.id = access_control.player_id WHERE access_control.control_id = 7').fetchall()
@@ -315,18 +326,21 @@ def send_event_message(update: Update, context: CallbackContext) -> int:
             pin=True
             )
 
+    progress = ProgressReporter(
+            admin_msg.edit_text,
+            total=len(send_list),
+            label="Sending event announcements..."
+            )
+
     failed_sends = list()
-    for i in range(len(send_list)):
-        admin_msg.edit_text(
-                f"Sending event announcements... {i}/{len(send_list)}"
-                )
+    for i, outcome in enumerate(send_message_generator, start=1):
+        progress.update(i)
 
-        outcome = next(send_message_generator)
         if outcome != "success":
             failed_sends.append(outcome)
 
     failed_users = ', '.join(failed_sends)
-    admin_msg.edit_text(
+    progress.finish(
             f"Sending event announcements complete. list of uncompleted sends: \n\n{failed_users}"
             )
 
@@ -354,16 +368,21 @@ def send_message(update: Update, context: CallbackContext) -> None:
     send_message_generator = user_instance.send_message_by_list(
             send_list=send_list, msg=msg, msg_entities=msg_entities, pin=True)
 
+    progress = ProgressReporter(
+            admin_msg.edit_text,
+            total=len(send_list),
+            label="Sending announcements..."
+            )
+
     failed_list = list()
-    for i in range(len(send_list)):
-        admin_msg.edit_text(f"Sending announcements... {i}/{len(send_list)}")
+    for i, outcome in enumerate(send_message_generator, start=1):
+        progress.update(i)
 
-        outcome = next(send_message_generator)
         if outcome != 'success':
             failed_list.append(outcome)
 
     failed_users = ", ".join(failed_list)
-    admin_msg.edit_text(
+    progress.finish(
             f"Sending announcements complete. list of uncompleted sends: \n\n {failed_users}")
 
     logger.info("User %s sucessfully sent announcements", user.first_name)
@@ -397,17 +416,22 @@ def send_reminders(update: Update, context: CallbackContext) -> None:
             unindicated_players, msg=msg, parse_mode='HTML'
             )
 
+    progress = ProgressReporter(
+            query.edit_message_text,
+            total=len(unindicated_players),
+            label="sending reminders"
+            )
+
     failed_sends = list()
-    for i in range(len(unindicated_players)):
-        query.edit_message_text(f"sending reminders {i}/{len(unindicated_players)}")
+    for i, outcome in enumerate(send_message_generator, start=1):
+        progress.update(i)
 
-        outcome = next(send_message_generator)
         if outcome != 'success':
             failed_sends.append(outcome)
 
     unsent_users = ', '.join(failed_sends)
-    query.edit_message_text(
-            text=f"Reminders have been sent sucessfully for {e_details}\n\nUnsucessful sends: \n{unsent_users}"
+    progress.finish(
+            f"Reminders have been sent sucessfully for {e_details}\n\nUnsucessful sends: \n{unsent_users}"
             )
 
     logger.info("reminders sent successfuly by User %s", update.effective_user.first_name)
@@ -858,14 +882,7 @@ def choose_access_level(update: Update, context: CallbackContext) -> int:
     user_instance = AdminUser(user)
 
     logger.info("user %s is started /access_control_administration", user.first_name)
-    access_data = user_instance.get_access_levels()
-
-    buttons = list()
-    for row in access_data:
-        button = InlineKeyboardButton(text=row['description'], callback_data=str(row['id']))
-        buttons.append([button])
-
-    reply_markup = InlineKeyboardMarkup(buttons)
+    reply_markup = user_instance.access_keyboard()
     update.message.reply_text(
             text='''
 <u>Guests:</u>
@@ -913,14 +930,7 @@ def choose_access_level_again(update: Update, context: CallbackContext) -> int:
     query.answer()
 
     user_instance = AdminUser(user)
-    access_data = user_instance.get_access_levels()
-    
-    buttons = list()
-    for row in access_data:
-        button = InlineKeyboardButton(text=row['description'], callback_data=str(row['id']))
-        buttons.append([button])
-
-    reply_markup = InlineKeyboardMarkup(buttons)
+    reply_markup = user_instance.access_keyboard()
     query.edit_message_text(
             text='''
 <u>Guests:</u>
@@ -1135,8 +1145,7 @@ def cancel(update: Update, context: CallbackContext) -> int:
 
 
 def main():
-    with open(os.path.join(".secrets", "bot_credentials.json"), "r") as f:
-        bot_tokens = json.load(f)
+    bot_tokens = get_bot_tokens()
 
     if CONFIG["development"]:
         admin_token = bot_tokens["admin_dev_bot"]
@@ -1145,7 +1154,7 @@ def main():
 
     # upgrade if there is
     version = src.Upgrade.upgrade_manager.UpgradeManager(
-            config=CONFIG, cur_ver=2.11
+            config=CONFIG, cur_ver=2.14
             )
     updated = version.update_system()
     if updated:
@@ -1153,7 +1162,8 @@ def main():
     else:
         logger.info("no updates found. continuing...")
 
-
+    # preload the access level catalogue used by the access menus
+    src.Database.sqlite.AccessTableSqlite().access_levels()
 
     # setting command list
     commands = [
@@ -1167,9 +1177,12 @@ def main():
             BotCommand("cancel", "cancel any existing operation"),
             BotCommand("help", "help"),
             ]
-    Bot(admin_token).set_my_commands(commands)
+    get_bot(admin_token).set_my_commands(commands)
 
-    updater = Updater(admin_token)
+    # every worker may hold a db connection
+    workers = CONFIG.get('bot_workers', 4)
+    src.Database.connection.check_pool_size(workers)
+    updater = Updater(bot=get_bot(admin_token), workers=workers)
     dispatcher = updater.dispatcher
 
     conv_handler_attendance_list = ConversationHandler(
@@ -1181,6 +1194,7 @@ def main():
                     ],
                 },
             fallbacks=[CommandHandler('cancel', cancel)],
+            run_async=True,
             )
 
     conv_handler_announce = ConversationHandler(
@@ -1192,7 +1206,8 @@ def main():
                     CallbackQueryHandler(edit_msg, pattern=f'^back$')
                     ],
                 },
-            fallbacks=[CommandHandler('cancel', cancel)]
+            fallbacks=[CommandHandler('cancel', cancel)],
+            run_async=True,
             )
 
     conv_handler_announce_event = ConversationHandler(
@@ -1209,7 +1224,8 @@ def main():
                     ],
 
                 },
-            fallbacks=[CommandHandler('cancel', cancel)]
+            fallbacks=[CommandHandler('cancel', cancel)],
+            run_async=True,
             )
     conv_handler_remind = ConversationHandler(
         entry_points=[CommandHandler("remind", choosing_date)],
@@ -1220,6 +1236,7 @@ def main():
                 ],
             },
         fallbacks=[CommandHandler('cancel', cancel)],
+        run_async=True,
         )
 
     conv_handler_event_administration = ConversationHandler(
@@ -1259,6 +1276,7 @@ def main():
                     ]
                 },
             fallbacks=[CommandHandler('cancel', cancel)],
+            run_async=True,
             )
     conv_handler_access_administration = ConversationHandler(
             entry_points=[CommandHandler('access_control_administration', choose_access_level)],
@@ -1276,10 +1294,11 @@ def main():
                     ],
                 4: [CallbackQueryHandler(commit_access_change)],
                 },
-            fallbacks=[CommandHandler('cancel', cancel)]
+            fallbacks=[CommandHandler('cancel', cancel)],
+            run_async=True,
             )
 
-    dispatcher.add_handler(CommandHandler("start", start))
+    dispatcher.add_handler(CommandHandler("start", start, run_async=True))
     dispatcher.add_handler(conv_handler_attendance_list)
     dispatcher.add_handler(conv_handler_announce)
     dispatcher.add_handler(conv_handler_announce_event)
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import argparse
+import random
+import tempfile
+import time
+
+import src.Upgrade.upgrade
+from src.Database.query_registry import QueryRegistry
+
+
+# unindicated_users.sql before the anti join rewrite, kept for comparison
+LEGACY_UNINDICATED_USERS = """
+    SELECT id, name, telegram_user,
+    access_control.control_id
+    FROM players
+    JOIN access_control on players.id = access_control.player_id
+    WHERE name NOT IN
+    (
+	SELECT name FROM players
+	JOIN attendance ON players.id = attendance.player_id
+	JOIN access_control ON players.id = access_control.player_id
+	WHERE event_id = ?
+    )
+    AND notification == 1
+    AND access_control.control_id >= 4
+    AND access_control.control_id != 7
+    AND players.hidden = 0
+    ORDER BY
+    players.gender DESC,
+    players.name COLLATE NOCASE
+"""
+
+
+def create_database(
+        database: str,
+        n_players: int,
+        n_events: int,
+        indicated: float,
+        seed: int = 0
+) -> list:
+    """
+    creates an upgraded attendance db filled with random players,
+    events and attendance
+
+    returns the list of event ids
+    """
+    rng = random.Random(seed)
+
+    con = src.Upgrade.upgrade.create_database(database)
+
+    players = [
+        (i, f"Player {i}", f"player_{i}", rng.choice(['Male', 'Female']),
+         int(rng.random() < 0.9), 'default', 0)
+        for i in range(1, n_players + 1)
+    ]
+    access = [(i, rng.choice([2, 4, 4, 4, 5])) for i in range(1, n_players + 1)]
+    event_ids = [202301010000 + i * 10000 for i in range(n_events)]
+    events = [
+        (event_id, 'Field Training', '2023-01-01', '10:00', '12:00',
+         'TBC', None, 2, '', 1)
+        for event_id in event_ids
+    ]
+    attendance = [
+        (event_id, player_id, rng.choice([0, 1]), '')
+        for event_id in event_ids
+        for player_id in range(1, n_players + 1)
+        if rng.random() < indicated
+    ]
+
+    con.execute('BEGIN TRANSACTION')
+    con.executemany("INSERT INTO players VALUES (?, ?, ?, ?, ?, ?, ?)", players)
+    con.executemany("INSERT INTO access_control VALUES (?, ?)", access)
+    con.executemany(
+        "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", events)
+    con.executemany("INSERT INTO attendance VALUES (?, ?, ?, ?)", attendance)
+    con.commit()
+    con.execute('ANALYZE')
+    con.close()
+
+    return event_ids
+
+
+def time_query(con, query: str, event_ids: list) -> float:
+    """
+    returns the mean time in ms to run query for each of event_ids
+    """
+    start = time.perf_counter()
+    for event_id in event_ids:
+        con.execute(query, (event_id, )).fetchall()
+    return (time.perf_counter() - start) / len(event_ids) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=5000,
+                        help="number of players to generate")
+    parser.add_argument("--events", type=int, default=500,
+                        help="number of events to generate")
+    parser.add_argument("--indicated", type=float, default=0.3,
+                        help="fraction of players indicating per event")
+    parser.add_argument("--samples", type=int, default=20,
+                        help="number of events to time the queries on")
+    args = parser.parse_args()
+
+    queries = QueryRegistry()
+    unindicated_users = queries.get(
+        'unindicated_users.sql', access_range='member')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = os.path.join(tmp_dir, 'benchmark.db')
+        event_ids = create_database(
+            database, args.players, args.events, args.indicated)
+        samples = random.Random(1).sample(
+            event_ids, min(args.samples, len(event_ids)))
+
+        con = sqlite3.connect(database)
+        legacy = [tuple(row) for row in con.execute(
+            LEGACY_UNINDICATED_USERS, (samples[0], )).fetchall()]
+        current = [tuple(row) for row in con.execute(
+            unindicated_users, (samples[0], )).fetchall()]
+        if legacy != current:
+            raise AssertionError("queries do not return the same players")
+
+        print(f"players: {args.players}, events: {args.events}, "
+              f"indicated: {args.indicated:.0%}")
+        print(f"unindicated_users (NOT IN on name): "
+              f"{time_query(con, LEGACY_UNINDICATED_USERS, samples):.2f} ms/event")
+        print(f"unindicated_users (NOT EXISTS on id): "
+              f"{time_query(con, unindicated_users, samples):.2f} ms/event")
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,21 @@
 import os
-import sqlite3
 import argparse
 import sys
 import helpers
 import csv
 from datetime import datetime
 
+import src.Database.sqlite
 from src.event_manager import TrainingEventManager
 
 
-db = sqlite3.connect("resources/attendance.db", check_same_thread=False)
-
-
 def get_attendance_by_month(target_month: datetime) -> list:
-    db.row_factory = lambda cursor, row: row[0]
     target_month = target_month.strftime("%m%Y")
-    event_id_list = db.execute(
-        "SELECT id FROM events WHERE strftime('%m%Y', event_date) = ?", (target_month, )).fetchall()
+    with src.Database.sqlite.snapshot() as db:
+        event_id_list = db.execute(
+            "SELECT id FROM events WHERE strftime('%m%Y', event_date) = ?", (target_month, )).fetchall()
 
-    return event_id_list
+    return [row['id'] for row in event_id_list]
 
 
 def get_attendance(event_id_list: list) -> dict:
@@ -88,9 +85,10 @@ def main():
                         help="outpath to the file created", default=None)
     args = parser.parse_args()
     target_month = datetime.strptime(args.month, "%m-%y")
-    event_id_list = get_attendance_by_month(target_month=target_month)
-
-    attendance_dict = get_attendance(event_id_list)
+    # the whole report is read from one snapshot of the db
+    with src.Database.sqlite.snapshot():
+        event_id_list = get_attendance_by_month(target_month=target_month)
+        attendance_dict = get_attendance(event_id_list)
     write_csv_attendance(
         attendance_dict, target_month=args.month, out_file=args.out_file)
 
@@ -32,6 +32,8 @@ CREATE TABLE attendance(
     FOREIGN KEY(event_id) REFERENCES events(id), 
     FOREIGN KEY(player_id) REFERENCES players(id)
 );
+CREATE UNIQUE INDEX attendance_event_player ON attendance(event_id, player_id);
+CREATE INDEX attendance_player ON attendance(player_id);
 
 
 CREATE TABLE access_control(
@@ -40,6 +42,7 @@ CREATE TABLE access_control(
     FOREIGN KEY (player_id) REFERENCES players(id),
     FOREIGN KEY (control_id) references access_control_description(id)
 );
+CREATE UNIQUE INDEX access_control_player ON access_control(player_id);
 
 
 
@@ -76,4 +79,7 @@ CREATE TABLE announcement_entities(
     entity_length INT,
     FOREIGN KEY(event_id) REFERENCES events(id)
 );
+CREATE INDEX announcement_entities_event ON announcement_entities(event_id);
 
+-- kaypoh_messages, change_log, attendance_versions and their triggers
+-- are added by the upgrades, see create_database in src/Upgrade/upgrade.py
@@ -8,6 +8,9 @@ CREATE TABLE kaypoh_messages(
     player_id LONGINT,
     message_id LONGINT,
     event_id LONGINT,
+    text_hash TEXT,
     FOREIGN KEY(player_id) REFERENCES players(id)
     FOREIGN KEY(event_id) REFERENCES players(id)
 );
+CREATE UNIQUE INDEX kaypoh_messages_event_player ON kaypoh_messages(event_id, player_id);
+CREATE INDEX kaypoh_messages_player ON kaypoh_messages(player_id);
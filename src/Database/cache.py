@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+with open("config.json") as f:
+    CONFIG = json.load(f)
+
+
+class TTLCache:
+    """
+    thread safe mapping with LRU eviction and an optional time to live
+
+    entries older than ttl seconds are treated as missing,
+    once maxsize entries are held the least recently used one is dropped.
+    a ttl of None keeps entries until they are evicted or invalidated
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expiry, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        returns the value cached for key,
+        default if it is missing or expired
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expiry, value = entry
+                if expiry is None or expiry > self.clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        expiry = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._data[key] = (expiry, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        hit and miss counters and the current size of the cache
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+
+_caches = dict()
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, maxsize: int = 1024, ttl: float = None) -> TTLCache:
+    """
+    returns the shared cache called name, creating it on first use
+
+    maxsize and ttl can be overridden per cache in config.json,
+    eg. "cache": {"access": {"maxsize": 512, "ttl": 60}}
+    """
+    with _caches_lock:
+        if name not in _caches:
+            settings = CONFIG.get('cache', dict()).get(name, dict())
+            _caches[name] = TTLCache(
+                maxsize=settings.get('maxsize', maxsize),
+                ttl=settings.get('ttl', ttl)
+            )
+        return _caches[name]
@@ -0,0 +1,312 @@
+import sqlite3
+import json
+import threading
+import weakref
+from pathlib import Path
+from types import MappingProxyType
+
+
+with open("config.json") as f:
+    CONFIG = json.load(f)
+
+
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def profile_pragmas(profile: dict) -> list:
+    """
+    turns a durability profile from config.json into pragma statements
+
+    profile fields (all optional):
+        busy_timeout: ms to wait on a locked database
+        journal_mode: one of JOURNAL_MODES, eg. 'WAL'
+        synchronous: one of SYNCHRONOUS_MODES, eg. 'NORMAL'
+        cache_size: pages if positive, KiB if negative
+
+    Raises:
+        ValueError: if a field is unknown or has an invalid value
+    """
+    pragmas = list()
+    profile = dict(profile)
+
+    # busy_timeout goes first so that switching journal mode waits on locks
+    if 'busy_timeout' in profile:
+        pragmas.append(
+            f"PRAGMA busy_timeout = {int(profile.pop('busy_timeout'))}")
+
+    if 'journal_mode' in profile:
+        journal_mode = str(profile.pop('journal_mode')).upper()
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(
+                f"journal_mode: {journal_mode} must be one of {JOURNAL_MODES}")
+        pragmas.append(f"PRAGMA journal_mode = {journal_mode}")
+
+    if 'synchronous' in profile:
+        synchronous = str(profile.pop('synchronous')).upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(
+                f"synchronous: {synchronous} must be one of {SYNCHRONOUS_MODES}")
+        pragmas.append(f"PRAGMA synchronous = {synchronous}")
+
+    if 'cache_size' in profile:
+        pragmas.append(f"PRAGMA cache_size = {int(profile.pop('cache_size'))}")
+
+    if profile:
+        raise ValueError(f"unknown db_profile fields: {list(profile)}")
+
+    return pragmas
+
+
+class _Lease:
+    """
+    binds a pooled connection to the thread holding it
+    the connection goes back to the pool when the thread exits
+    or when release() is called
+    """
+
+    def __init__(self, registry, con: sqlite3.Connection):
+        self.con = con
+        self._finalizer = weakref.finalize(
+            self, registry.release_connection, con)
+
+    def release(self):
+        self._finalizer()
+
+
+class ConnectionRegistry:
+    """
+    process wide registry of sqlite3 connections to one database file
+
+    every thread is handed its own connection, drawn from a pool that
+    holds at most pool_size connections. idle connections of finished
+    threads are reused by new threads.
+
+    read_only registries open the database with mode=ro and query_only,
+    the journal mode of the database is left to the read write connections
+    """
+
+    def __init__(self,
+                 database: str,
+                 pool_size: int = 16,
+                 timeout: float = 30,
+                 profile: dict = None,
+                 read_only: bool = False
+                 ):
+        self.database = database
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.read_only = read_only
+
+        profile = dict(profile or dict())
+        if read_only:
+            profile.pop('journal_mode', None)
+        self.pragmas = profile_pragmas(profile)
+        if read_only:
+            self.pragmas.append('PRAGMA query_only = ON')
+
+        self._idle = list()
+        self._n_open = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+        self._data_version = None
+        self._table_versions = MappingProxyType(dict())
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        opens a new connection to the database
+        and applies the durability profile
+        """
+        if self.read_only:
+            uri = f"{Path(self.database).absolute().as_uri()}?mode=ro"
+            con = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            con = sqlite3.connect(self.database, check_same_thread=False)
+        con.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            con.execute(pragma).fetchall()
+        return con
+
+    def get_connection(self) -> sqlite3.Connection:
+        """
+        returns the connection of the calling thread,
+        leasing one from the pool on first use
+        """
+        lease = getattr(self._local, 'lease', None)
+        if lease is None:
+            lease = _Lease(self, self.acquire())
+            self._local.lease = lease
+        return lease.con
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        take an idle connection or open a new one if the pool is not full,
+        otherwise wait for a connection to be released
+
+        Raises:
+            TimeoutError: if no connection is released within timeout
+        """
+        with self._cond:
+            while not self._idle and self._n_open >= self.pool_size:
+                if not self._cond.wait(self.timeout):
+                    raise TimeoutError(
+                        f"no connection to {self.database} released "
+                        f"within {self.timeout}s, pool size: {self.pool_size}"
+                    )
+            if self._idle:
+                return self._idle.pop()
+            self._n_open += 1
+
+        try:
+            return self.connect()
+        except Exception:
+            with self._cond:
+                self._n_open -= 1
+                self._cond.notify()
+            raise
+
+    def release_connection(self, con: sqlite3.Connection):
+        """
+        hand a connection back to the pool
+        """
+        if con.in_transaction:
+            con.rollback()
+        with self._cond:
+            self._idle.append(con)
+            self._cond.notify()
+
+    def release(self):
+        """
+        release the connection of the calling thread back to the pool
+        """
+        lease = getattr(self._local, 'lease', None)
+        if lease is None:
+            return
+        del self._local.lease
+        lease.release()
+
+    def data_version(self) -> int:
+        """
+        PRAGMA data_version of a connection that never writes,
+        it changes whenever any other connection, in this process or
+        another one, commits to the database
+        """
+        with self._monitor_lock:
+            return self._monitor_data_version()
+
+    def _monitor_data_version(self) -> int:
+        if self._monitor is None:
+            self._monitor = self.connect()
+        return self._monitor.execute('PRAGMA data_version').fetchone()[0]
+
+    def table_versions(self) -> MappingProxyType:
+        """
+        versions of the tables in change_log, see upgrade_2_13
+        change_log is only read again after data_version changes,
+        the same mapping is returned as long as nothing was committed
+
+        returns an empty mapping if the database has no change_log
+        """
+        with self._monitor_lock:
+            data_version = self._monitor_data_version()
+            if data_version != self._data_version:
+                try:
+                    rows = self._monitor.execute(
+                        'SELECT table_name, version FROM change_log').fetchall()
+                except sqlite3.OperationalError:
+                    rows = list()
+                self._table_versions = MappingProxyType(
+                    {row['table_name']: row['version'] for row in rows})
+                self._data_version = data_version
+            return self._table_versions
+
+    def n_connections(self) -> int:
+        """
+        number of connections currently opened by the registry
+        """
+        return self._n_open
+
+    def close_idle(self):
+        """
+        close all connections that are not leased to a thread
+        """
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._n_open -= 1
+            self._cond.notify_all()
+
+
+# threads of the apscheduler pool behind the telegram.ext.JobQueue
+JOB_QUEUE_WORKERS = 10
+
+
+def required_pool_size(workers: int,
+                       job_workers: int = JOB_QUEUE_WORKERS,
+                       readers: int = None) -> int:
+    """
+    connections needed when every long lived thread of a bot holds one:
+    the main thread, the dispatcher, its run_async workers, the job queue
+    workers, the db readers and the db writer
+    """
+    if readers is None:
+        readers = CONFIG.get('db_readers', 4)
+    return 2 + workers + job_workers + readers + 1
+
+
+def check_pool_size(workers: int, pool_size: int = None):
+    """
+    check that db_pool_size leaves a connection for every thread of a bot
+    with workers run_async workers, a smaller pool stalls handlers
+
+    Raises:
+        ValueError: if the pool is too small
+    """
+    if pool_size is None:
+        pool_size = CONFIG.get('db_pool_size', 16)
+    required = required_pool_size(workers)
+    if pool_size < required:
+        raise ValueError(
+            f"db_pool_size: {pool_size} is smaller than the {required} "
+            f"connections needed by {workers} workers"
+        )
+
+
+def release_thread_connections():
+    """
+    release the connections held by the calling thread in every registry,
+    for jobs that should not keep a connection between runs
+    """
+    with _registries_lock:
+        registries = list(_registries.values())
+    for registry in registries:
+        registry.release()
+
+
+_registries = dict()
+_registries_lock = threading.Lock()
+
+
+def get_registry(database: str = None,
+                 read_only: bool = False) -> ConnectionRegistry:
+    """
+    returns the shared registry for database,
+    defaults to the database in config.json
+    read only and read write connections are pooled separately
+    """
+    if database is None:
+        database = CONFIG['database']
+
+    with _registries_lock:
+        if (database, read_only) not in _registries:
+            _registries[(database, read_only)] = ConnectionRegistry(
+                database,
+                pool_size=CONFIG.get('db_pool_size', 16),
+                timeout=CONFIG.get('db_pool_timeout', 30),
+                profile=CONFIG.get('db_profile'),
+                read_only=read_only
+            )
+        return _registries[(database, read_only)]
@@ -0,0 +1,100 @@
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import wraps
+
+
+with open("config.json") as f:
+    CONFIG = json.load(f)
+
+WRITER_THREAD_NAME = 'db-writer'
+
+
+class DatabaseExecutor:
+    """
+    runs connector calls off the calling thread and returns futures
+
+    reads are spread over a small pool of reader threads,
+    writes all go to a single writer thread so that commits are serialized.
+    every thread leases its own connection from the ConnectionRegistry
+    """
+
+    def __init__(self, n_readers: int = 4):
+        self.readers = ThreadPoolExecutor(
+            max_workers=n_readers, thread_name_prefix='db-reader')
+        self.writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=WRITER_THREAD_NAME)
+
+    def read(self, func, *args, **kwargs) -> Future:
+        """
+        run func(*args, **kwargs) on a reader thread
+        """
+        return self.readers.submit(func, *args, **kwargs)
+
+    def write(self, func, *args, **kwargs) -> Future:
+        """
+        run func(*args, **kwargs) on the writer thread
+        """
+        if is_writer_thread():
+            future = Future()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self.writer.submit(func, *args, **kwargs)
+
+    def gather(self, *futures: Future, timeout: float = None) -> list:
+        """
+        wait for all futures, returns their results in order
+        the first exception raised by a future is reraised
+        """
+        return [future.result(timeout=timeout) for future in futures]
+
+    def shutdown(self, wait: bool = True):
+        self.readers.shutdown(wait=wait)
+        self.writer.shutdown(wait=wait)
+
+
+def is_writer_thread() -> bool:
+    return threading.current_thread().name.startswith(WRITER_THREAD_NAME)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> DatabaseExecutor:
+    """
+    returns the shared executor, starting it on first use
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = DatabaseExecutor(
+                n_readers=CONFIG.get('db_readers', 4))
+        return _executor
+
+
+def serialized_write(func):
+    """
+    decorator for connector methods that write to the db,
+    the method is run on the writer thread and the caller waits for it.
+    the bots register their handlers with run_async=True, so a waiting
+    handler holds one run_async worker and not the dispatcher
+
+    a failed write rolls back its open transaction so that
+    the connection of the writer thread stays usable
+    """
+    def run(connector, *args, **kwargs):
+        try:
+            return func(connector, *args, **kwargs)
+        except Exception:
+            if connector.con.in_transaction:
+                connector.con.rollback()
+            raise
+
+    @wraps(func)
+    def wrapped(connector, *args, **kwargs):
+        return get_executor().write(run, connector, *args, **kwargs).result()
+    return wrapped
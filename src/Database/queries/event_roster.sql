@@ -0,0 +1,31 @@
+SELECT
+	id, name, gender, telegram_user,
+	access_control.control_id,
+	attendance.status, attendance.reason,
+	CASE
+		WHEN attendance.status = 1 AND gender = 'Male' THEN 'male'
+		WHEN attendance.status = 1 AND gender = 'Female' THEN 'female'
+		WHEN attendance.status = 0 THEN 'absent'
+		WHEN attendance.player_id IS NULL THEN 'unindicated'
+	END AS category
+FROM players
+JOIN access_control on players.id = access_control.player_id
+LEFT JOIN attendance on players.id = attendance.player_id
+	AND attendance.event_id = ?
+WHERE players.hidden = 0
+AND access_control.control_id != 7
+AND access_control.control_id >= 2
+AND (
+	attendance.player_id IS NOT NULL
+	OR (
+		players.notification = 1
+		AND access_control.control_id >= 4
+	)
+)
+ORDER BY
+players.gender DESC,
+CASE WHEN
+	access_control.control_id >= 4 then 0 else 1 end,
+CASE WHEN
+	attendance.player_id IS NULL then lower(players.name) end,
+players.name
@@ -2,12 +2,11 @@
     access_control.control_id
     FROM players
     JOIN access_control on players.id = access_control.player_id
-    WHERE name NOT IN
+    WHERE NOT EXISTS
     (
-	SELECT name FROM players
-	JOIN attendance ON players.id = attendance.player_id
-	JOIN access_control ON players.id = access_control.player_id
-	WHERE event_id = ?
+	SELECT 1 FROM attendance
+	WHERE attendance.event_id = ?
+	AND attendance.player_id = players.id
     )
     AND notification == 1
     AND access_control.control_id {access_range}
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import string
+import threading
+from itertools import product
+
+
+QUERY_DIR = os.path.join('src', 'Database', 'queries')
+
+# sql fragments for the placeholders of templated queries,
+# every combination is formatted once when the registry is loaded
+VARIANTS = {
+    'attendance_query.sql': {
+        'gender': {
+            'both': "",
+            'male': "AND gender = 'Male'",
+            'female': "AND gender = 'Female'",
+        },
+        'access_range': {
+            'member': '> 3',
+            'guest': 'BETWEEN 2 AND 3',
+            'all': '>= 2',
+        },
+    },
+    'unindicated_users.sql': {
+        'access_range': {
+            'member': '>= 4',
+            'guest': 'BETWEEN 2 AND 3',
+            'all': '>= 2',
+        },
+    },
+}
+
+# placeholders that are filled by the connector at runtime
+DYNAMIC_FIELDS = {
+    'update_user.sql': {'update_columns'},
+}
+
+
+def placeholders(query: str) -> set:
+    """
+    returns the names of the {placeholders} in a query template
+    """
+    return {
+        field for _, field, _, _ in string.Formatter().parse(query)
+        if field is not None
+    }
+
+
+class QueryRegistry:
+    """
+    loads every .sql file in query_dir once and keeps
+    the ready made statements of all templated variants in memory
+    """
+
+    def __init__(self, query_dir: str = QUERY_DIR, variants: dict = VARIANTS):
+        self.query_dir = query_dir
+        self.variants = variants
+
+        self.queries = dict()  # filename -> raw query
+        self.statements = dict()  # (filename, ((field, key), ...)) -> query
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """
+        read and validate all queries in query_dir
+
+        Raises:
+            ValueError: if a query has placeholders with no known variants
+                        or a statement is incomplete
+        """
+        queries = dict()
+        for q_file in sorted(os.listdir(self.query_dir)):
+            if not q_file.endswith('.sql'):
+                continue
+            with open(os.path.join(self.query_dir, q_file)) as f:
+                queries[q_file] = f.read()
+
+        statements = dict()
+        for q_file, query in queries.items():
+            fields = placeholders(query)
+            variants = self.variants.get(q_file, dict())
+            dynamic = DYNAMIC_FIELDS.get(q_file, set())
+
+            unknown = fields - set(variants) - dynamic
+            if unknown:
+                raise ValueError(
+                    f"{q_file}: no variants for placeholders {sorted(unknown)}")
+            if dynamic & fields:
+                continue
+
+            names = sorted(variants)
+            for keys in product(*(variants[name] for name in names)):
+                statement = query.format(**{
+                    name: variants[name][key] for name, key in zip(names, keys)
+                })
+                if not sqlite3.complete_statement(statement.rstrip() + ";"):
+                    raise ValueError(f"{q_file}: incomplete sql statement")
+                statements[(q_file, tuple(zip(names, keys)))] = statement
+
+        self.queries = queries
+        self.statements = statements
+
+    def read(self, q_file: str) -> str:
+        """
+        returns the raw query template of q_file
+        """
+        return self.queries[q_file]
+
+    def get(self, q_file: str, **fields) -> str:
+        """
+        returns the statement of q_file
+        templated variants are chosen by the keys in VARIANTS,
+        eg. get('attendance_query.sql', gender='male', access_range='all')
+
+        dynamic fields are formatted with their values and kept
+        so that the same statement string is returned on every call
+
+        Raises:
+            KeyError: if the query or variant does not exist
+        """
+        key = (q_file, tuple(sorted(fields.items())))
+        statement = self.statements.get(key)
+        if statement is not None:
+            return statement
+
+        if not set(fields) <= DYNAMIC_FIELDS.get(q_file, set()):
+            raise KeyError(f"{q_file} has no variant {fields}")
+
+        statement = self.read(q_file).format(**fields)
+        with self._lock:
+            self.statements[key] = statement
+        return statement
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_query_registry() -> QueryRegistry:
+    """
+    returns the shared query registry, loading it on first use
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = QueryRegistry()
+        return _registry
@@ -1,39 +1,164 @@
 import sqlite3
-import os
+import threading
 from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime, date
-from telegram import MessageEntity
+from types import MappingProxyType
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, MessageEntity
+from src.Database.connection import get_registry
+from src.Database.query_registry import get_query_registry
+from src.Database.executor import serialized_write
+from src.Database.cache import get_cache
+
+
+# cached value of a key that is not in the db
+_MISSING = object()
+
+# caches by the tables their entries are read from,
+# entries are dropped once one of the tables changes in any process.
+# the cache ttls stay as a backstop for a stale row put after the sync
+CACHE_DEPENDENCIES = {
+    'access': ('access_control', ),
+    'events': ('events', 'announcement_entities'),
+    'future_events': ('events', ),
+}
+
+# database -> table versions the caches were last synced to
+_synced_versions = dict()
+_synced_versions_lock = threading.Lock()
+
+# read only connections of the threads that are inside snapshot()
+_snapshots = threading.local()
+
+
+@contextmanager
+def snapshot(database: str = None):
+    """
+    consistent read only view of the database for the calling thread
+
+    while inside the block, every connector read on this thread goes
+    through one read only connection in a single read transaction,
+    writes are unaffected as they run on the writer thread
+    """
+    registry = get_registry(database, read_only=True)
+    cons = getattr(_snapshots, 'cons', None)
+    if cons is None:
+        cons = _snapshots.cons = dict()
+
+    if registry.database in cons:
+        # nested snapshot, reuse the outer one
+        yield cons[registry.database]
+        return
+
+    con = registry.get_connection()
+    con.execute('BEGIN')
+    cons[registry.database] = con
+    try:
+        yield con
+    finally:
+        del cons[registry.database]
+        con.rollback()
 
 
 class Sqlite:
     """
     sqlite3 DB connector
+    connections are shared through the process wide ConnectionRegistry,
+    each thread uses its own connection
     """
 
     def __init__(self, testing=False):
+        self.registry = get_registry()
+        self.queries = get_query_registry()
 
-        self.con = sqlite3.connect(
-            os.path.join('resources', 'attendance.db'),
-            check_same_thread=False
-        )
-        # self.con.row_factory = self.namedtuple_factory
-        self.con.row_factory = sqlite3.Row
-        self.cur = self.con.cursor()
+    @property
+    def con(self) -> sqlite3.Connection:
+        cons = getattr(_snapshots, 'cons', None)
+        if cons and self.registry.database in cons:
+            return cons[self.registry.database]
+        return self.registry.get_connection()
 
-    def read_query(self, q_file: str) -> str:
+    def snapshot(self):
         """
-        reads the query file from q_file
-        returns the content of the file in a string
+        read only snapshot of the database of this connector,
+        see snapshot()
         """
+        return snapshot(self.registry.database)
 
-        query_dir = os.path.join(
-            'src', 'Database', 'queries', q_file
-        )
+    def table_version(self, table: str):
+        """
+        version of a table in change_log, it changes with every write
+        to the table from any process. tables that are not tracked
+        change with every commit to the database
+        """
+        versions = self.registry.table_versions()
+        if table in versions:
+            return versions[table]
+        return ('data_version', self.registry.data_version())
 
-        with open(query_dir) as f:
-            query = f.read()
+    def changed_since(self, table: str, version) -> bool:
+        """
+        True if table has been written to since table_version returned version
+        """
+        return self.table_version(table) != version
 
-        return query
+    def attendance_version(self, event_id) -> tuple:
+        """
+        version of the roster of an event, changes whenever the attendance
+        of the event, the players or their access change in any process
+        read through the connection of the caller so that it matches
+        the roster read in the same snapshot
+        """
+        return tuple(self.con.execute(
+            """
+            SELECT
+                (SELECT version FROM change_log WHERE table_name = 'players'),
+                (SELECT version FROM change_log WHERE table_name = 'access_control'),
+                (SELECT version FROM attendance_versions WHERE event_id = ?)
+            """, (event_id, )).fetchone())
+
+    def sync_caches(self):
+        """
+        drop the caches in CACHE_DEPENDENCIES whose tables changed
+        since the last sync, costs a PRAGMA when nothing was committed
+        """
+        versions = self.registry.table_versions()
+        if not versions:
+            data_version = self.registry.data_version()
+            versions = {
+                table: data_version
+                for tables in CACHE_DEPENDENCIES.values() for table in tables
+            }
+
+        database = self.registry.database
+        with _synced_versions_lock:
+            synced = _synced_versions.get(database)
+            if synced == versions:
+                return
+            _synced_versions[database] = versions
+
+        if synced is None:
+            return
+        for name, tables in CACHE_DEPENDENCIES.items():
+            if any(versions.get(table) != synced.get(table) for table in tables):
+                get_cache(name).clear()
+
+    @property
+    def cur(self) -> sqlite3.Cursor:
+        return self.con.cursor()
+
+    def read_query(self, q_file: str) -> str:
+        """
+        returns the content of the query file q_file,
+        queries are preloaded by the QueryRegistry
+        """
+        return self.queries.read(q_file)
+
+    def get_query(self, q_file: str, **fields) -> str:
+        """
+        returns the ready made statement of q_file for the given fields
+        """
+        return self.queries.get(q_file, **fields)
 
     def namedtuple_factory(self, cursor, row):
         fields = [column[0] for column in cursor.description]
@@ -50,11 +175,15 @@ class MessageTableSqlite(Sqlite):
         super().__init__()
     # CREATING
 
-    def insert_msg_record(self, user_id, message_id, event_id):
+    @serialized_write
+    def insert_msg_record(self, user_id, message_id, event_id, text_hash=None):
         self.cur.execute("BEGIN TRANSACTION")
         self.cur.execute(
-            "INSERT INTO kaypoh_messages VALUES (?, ?, ? )",
-            (user_id, message_id, event_id)
+            """
+            INSERT INTO kaypoh_messages(player_id, message_id, event_id, text_hash)
+            VALUES (?, ?, ?, ?)
+            """,
+            (user_id, message_id, event_id, text_hash)
         )
         self.con.commit()
 
@@ -63,30 +192,58 @@ class MessageTableSqlite(Sqlite):
         get msg records by event_id and/or user_id
         """
         conditions = list()
+        values = list()
         query = 'SELECT * FROM kaypoh_messages WHERE {conditions}'
 
         if event_id is None and user_id is None:
             raise SyntaxError("one of the fields must be filled")
         if event_id:
-            conditions.append(f'event_id = {event_id}')
+            conditions.append('event_id = ?')
+            values.append(event_id)
 
         if user_id:
-            conditions.append(f'player_id = {user_id}')
+            conditions.append('player_id = ?')
+            values.append(user_id)
 
         conditions = ' AND '.join(conditions)
 
-        data = self.cur.execute(query.format(conditions=conditions)).fetchall()
+        data = self.cur.execute(
+            query.format(conditions=conditions), tuple(values)).fetchall()
 
         return data
 
-    def update_msg_record(self, user_id, message_id, event_id):
+    @serialized_write
+    def update_msg_record(self, user_id, message_id, event_id, text_hash=None):
         self.cur.execute('BEGIN TRANSACTION')
         self.cur.execute(
-            'UPDATE kaypoh_messages SET message_id = ? WHERE player_id = ? AND event_id = ?',
-            (message_id, user_id, event_id)
+            """
+            UPDATE kaypoh_messages SET message_id = ?, text_hash = ?
+            WHERE player_id = ? AND event_id = ?
+            """,
+            (message_id, text_hash, user_id, event_id)
+        )
+        self.con.commit()
+
+    @serialized_write
+    def update_msg_hashes(self, event_id, sent, text_hash):
+        """
+        record text_hash as the text last sent for event_id,
+        sent is a list of (user_id, previous hash)
+
+        a row is only updated if it still has its previous hash,
+        a newer text stored in the meantime is kept
+        """
+        self.cur.execute('BEGIN TRANSACTION')
+        self.cur.executemany(
+            """
+            UPDATE kaypoh_messages SET text_hash = ?
+            WHERE player_id = ? AND event_id = ? AND text_hash IS ?
+            """,
+            [(text_hash, user_id, event_id, previous) for user_id, previous in sent]
         )
         self.con.commit()
 
+    @serialized_write
     def delete_msg_record(self,
                           user_id: int,
                           event_id: int):
@@ -107,6 +264,7 @@ class UsersTableSqlite(Sqlite):
         super().__init__()
     # CREATING
 
+    @serialized_write
     def insert_user(
         self,
         id: int,
@@ -177,11 +335,13 @@ class UsersTableSqlite(Sqlite):
 
         return user_data
 
+    @serialized_write
     def delete_user_by_id(self, id):
         self.cur.execute("BEGIN TRANSACTION")
         self.cur.execute("DELETE FROM players WHERE id = ?", (id, ))
         self.con.commit()
 
+    @serialized_write
     def update_user(self,
                     id: int,
                     name: str = None,
@@ -211,7 +371,6 @@ class UsersTableSqlite(Sqlite):
             None
 
         """
-        query = self.read_query("update_user.sql")
         update_values = []
         update_columns = []
 
@@ -244,17 +403,30 @@ class UsersTableSqlite(Sqlite):
 
         update_values.append(id)
         update_columns = ", ".join(update_columns)
+        query = self.get_query("update_user.sql", update_columns=update_columns)
 
         self.cur.execute("BEGIN TRANSACTION")
-        self.cur.execute(query.format(
-            update_columns=update_columns), tuple(update_values))
+        self.cur.execute(query, tuple(update_values))
         self.con.commit()
 
 
 class EventsTableSqlite(Sqlite):
+    """
+    CRUD operations for events
+
+    upcoming events are served from the process wide 'future_events'
+    cache by (database, day, access), every write to events clears it
+    """
+
+    future_events_cache = get_cache('future_events', maxsize=64, ttl=60)
+
     def __init__(self):
         super().__init__()
 
+    def invalidate_future_events(self):
+        self.future_events_cache.clear()
+
+    @serialized_write
     def insert_event(
             self,
             id: int,
@@ -319,6 +491,7 @@ class EventsTableSqlite(Sqlite):
              accountable)
         )
         self.con.commit()
+        self.invalidate_future_events()
 
     def get_event_by_id(self, id: int):
         """
@@ -330,7 +503,24 @@ class EventsTableSqlite(Sqlite):
 
         return event_data
 
+    def get_events_by_ids(self, ids: list):
+        """
+        gets all events in ids with one query, ordered by id
+        """
+        ids = list(ids)
+        if not ids:
+            return list()
+
+        placeholders = ', '.join('?' for _ in ids)
+        event_data = self.cur.execute(
+            f"SELECT * FROM events WHERE id IN ({placeholders}) ORDER BY id",
+            tuple(ids)
+        ).fetchall()
+
+        return event_data
+
     # TODO
+    @serialized_write
     def update_event(
             self,
             new_id: int,
@@ -410,11 +600,14 @@ class EventsTableSqlite(Sqlite):
              original_id)
         )
         self.con.commit()
+        self.invalidate_future_events()
 
+    @serialized_write
     def delete_event_by_id(self, id):
         self.cur.execute("BEGIN TRANSACTION")
         self.cur.execute("DELETE FROM events WHERE id = ?", (id, ))
         self.con.commit()
+        self.invalidate_future_events()
 
 
 class AttendanceTableSqlite(Sqlite):
@@ -425,6 +618,7 @@ class AttendanceTableSqlite(Sqlite):
     def __init__(self):
         super().__init__()
 
+    @serialized_write
     def insert_attendance(self,
                           user_id: int,
                           event_id: int,
@@ -474,6 +668,7 @@ class AttendanceTableSqlite(Sqlite):
 
         return attendance_data
 
+    @serialized_write
     def update_attendance(
             self,
             user_id: int,
@@ -505,6 +700,76 @@ class AttendanceTableSqlite(Sqlite):
         )
         self.con.commit()
 
+    @serialized_write
+    def upsert_attendance(
+            self,
+            user_id: int,
+            event_id: int,
+            status: int,
+            reason: str
+    ):
+        """
+        Insert or update the attendance record of a player in one statement.
+        relies on the unique index on attendance(event_id, player_id)
+
+        Args:
+            self: The current instance of the class.
+            user_id (int): The ID of the player.
+            event_id (int): The ID of the event.
+            status (int): The attendance status code.
+            reason (str): The reason for the attendance.
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        self.cur.execute("BEGIN TRANSACTION")
+        self.cur.execute(
+            """
+            INSERT INTO attendance VALUES (?, ?, ?, ?)
+            ON CONFLICT(event_id, player_id) DO UPDATE SET
+                status = excluded.status,
+                reason = excluded.reason""",
+            (event_id, user_id, status, reason)
+        )
+        self.con.commit()
+
+    @serialized_write
+    def upsert_many_attendance(
+            self,
+            user_id: int,
+            records: list
+    ):
+        """
+        Insert or update many attendance records of a player
+        in a single transaction.
+
+        Args:
+            self: The current instance of the class.
+            user_id (int): The ID of the player.
+            records (list): (event_id, status, reason) tuples.
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        self.cur.execute("BEGIN TRANSACTION")
+        self.cur.executemany(
+            """
+            INSERT INTO attendance VALUES (?, ?, ?, ?)
+            ON CONFLICT(event_id, player_id) DO UPDATE SET
+                status = excluded.status,
+                reason = excluded.reason""",
+            [(event_id, user_id, status, reason)
+             for event_id, status, reason in records]
+        )
+        self.con.commit()
+
+    @serialized_write
     def update_many_attendance_event_ids(
             self,
             original_event_id: int,
@@ -515,6 +780,7 @@ class AttendanceTableSqlite(Sqlite):
             (new_event_id, original_event_id))
         self.con.commit()
 
+    @serialized_write
     def delete_attendance(self, user_id, event_id):
         self.cur.execute("BEGIN TRANSACTION")
         self.cur.execute(
@@ -523,6 +789,7 @@ class AttendanceTableSqlite(Sqlite):
         )
         self.con.commit()
 
+    @serialized_write
     def delete_many_attendance_on_event(self, event_id):
         self.cur.execute("BEGIN TRANSACTION")
         self.cur.execute(
@@ -532,10 +799,90 @@ class AttendanceTableSqlite(Sqlite):
         self.con.commit()
 
 
+class AccessLevelCatalogue:
+    """
+    immutable copy of access_control_description
+    with the access menu keyboards of the admin bot
+    """
+
+    def __init__(self, rows: list, version: int):
+        self.rows = tuple(rows)
+        self.version = version
+        self.descriptions = MappingProxyType(
+            {row['id']: row['description'] for row in self.rows})
+        # levels above super user are not handed out through the menus
+        self.assignable = tuple(row for row in self.rows if row['id'] <= 100)
+        self._keyboards = dict()
+
+    def description(self, access: int) -> str:
+        """
+        Raises:
+            KeyError: if the access level does not exist
+        """
+        return self.descriptions[access]
+
+    def levels_for(self, access: int) -> tuple:
+        """
+        access levels that an admin with access can hand out,
+        only super users can hand out public and super user
+        """
+        if access != 100:
+            return self.assignable[1:8]
+        return self.assignable
+
+    def keyboard(self, access: int) -> InlineKeyboardMarkup:
+        """
+        inline keyboard of the levels_for access, built once per catalogue
+        """
+        keyboard = self._keyboards.get(access)
+        if keyboard is None:
+            keyboard = InlineKeyboardMarkup([
+                [InlineKeyboardButton(
+                    text=row['description'], callback_data=str(row['id']))]
+                for row in self.levels_for(access)
+            ])
+            self._keyboards[access] = keyboard
+        return keyboard
+
+
 class AccessTableSqlite(Sqlite):
+    """
+    access control of the players
+
+    get_access is served from the process wide 'access' cache,
+    the writes of this class invalidate the players they change,
+    writes of other processes are picked up by sync_caches,
+    entries expire after the ttl in any case
+    """
+
+    access_cache = get_cache('access', maxsize=1024, ttl=300)
+
+    # database -> AccessLevelCatalogue
+    _catalogues = dict()
+
     def __init__(self):
         super().__init__()
 
+    def access_levels(self) -> AccessLevelCatalogue:
+        """
+        catalogue of access_control_description,
+        reloaded only when the table version changes
+        """
+        database = self.registry.database
+        version = self.table_version('access_control_description')
+        catalogue = self._catalogues.get(database)
+        if catalogue is None or catalogue.version != version:
+            rows = self.cur.execute(
+                'SELECT * FROM access_control_description ORDER BY id'
+            ).fetchall()
+            catalogue = AccessLevelCatalogue(rows, version)
+            self._catalogues[database] = catalogue
+        return catalogue
+
+    def invalidate_access(self, user_id):
+        self.access_cache.invalidate((self.registry.database, user_id))
+
+    @serialized_write
     def insert_access(self, user_id: int, access: int):
         self.cur.execute("BEGIN TRANSACTION")
         self.cur.execute(
@@ -543,6 +890,7 @@ class AccessTableSqlite(Sqlite):
             (user_id, access)
         )
         self.con.commit()
+        self.invalidate_access(user_id)
 
     def get_access(self, user_id):
         """
@@ -552,9 +900,16 @@ class AccessTableSqlite(Sqlite):
             player_id
             control_id
         """
+        self.sync_caches()
+        key = (self.registry.database, user_id)
+        access_data = self.access_cache.get(key, _MISSING)
+        if access_data is not _MISSING:
+            return access_data
+
         access_data = self.cur.execute(
             "SELECT * FROM access_control WHERE player_id = ?",
             (user_id, )).fetchone()
+        self.access_cache.put(key, access_data)
 
         return access_data
 
@@ -562,11 +917,9 @@ class AccessTableSqlite(Sqlite):
         """
         get the position of an access
         """
-        position = self.cur.execute(
-            "SELECT * FROM access_control_description WHERE id = ?", (access, )
-        ).fetchone()
-        return position['description']
+        return self.access_levels().description(access)
 
+    @serialized_write
     def update_access(self, user_id, new_access):
         """
         Update access record in the database.
@@ -589,12 +942,15 @@ class AccessTableSqlite(Sqlite):
             (new_access, user_id)
         )
         self.con.commit()
+        self.invalidate_access(user_id)
 
+    @serialized_write
     def delete_user_access(self, id):
         self.cur.execute("BEGIN TRANSACTION")
         self.cur.execute(
             "DELETE FROM access_control WHERE player_id = ?", (id, ))
         self.con.commit()
+        self.invalidate_access(id)
 
 
 class AnnouncementEntitySqlite(Sqlite):
@@ -617,6 +973,7 @@ class AnnouncementEntitySqlite(Sqlite):
 
         return data
 
+    @serialized_write
     def delete_announcement_entities(self, event_id):
         """
         delete all announcement entities of id = event_id
@@ -628,6 +985,7 @@ class AnnouncementEntitySqlite(Sqlite):
         )
         self.con.commit()
 
+    @serialized_write
     def insert_announcement_entities(
             self,
             event_id: int,
@@ -659,6 +1017,38 @@ class AnnouncementEntitySqlite(Sqlite):
         )
         self.con.commit()
 
+    @serialized_write
+    def replace_announcement_entities(
+            self,
+            event_id: int,
+            entities: MessageEntity
+    ):
+        """
+        Replace all announcement entities of an event in one transaction.
+
+        Args:
+            self: The current instance of the class.
+            event_id (int): The ID of the event associated with the entities.
+            entities (list): A list of MessageEntity objects representing the announcement entities.
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        self.cur.execute('BEGIN TRANSACTION')
+        self.cur.execute(
+            "DELETE FROM announcement_entities WHERE event_id = ?",
+            (event_id,)
+        )
+        self.cur.executemany(
+            "INSERT INTO announcement_entities VALUES (?, ?, ?, ?)",
+            [(event_id, entity.type, entity.offset, entity.length)
+             for entity in entities]
+        )
+        self.con.commit()
+
 
 class SqliteEventManager(
         UsersTableSqlite,
@@ -697,32 +1087,20 @@ class SqliteEventManager(
         Raises:
             SyntaxError: If the provided gender or access_cat values are not valid.
         """
-        query = self.read_query('attendance_query.sql')
         data = [event_id, attendance]
         gender = gender.lower()
 
-        # formating query based on gender
-        if gender == "both":
-            gender = ""
-        elif gender == 'male' or gender == 'female':
-            gender = f"AND gender = '{gender.capitalize()}'"
-        else:
+        # query variants are preformatted based on gender and access_cat
+        if gender not in ('both', 'male', 'female'):
             raise SyntaxError("only male, female, or both is permitted")
 
-        # formatting query based on access_cat
         access_cat = access_cat.lower()
-
-        if access_cat == 'member':
-            access_range = '> 3'
-        elif access_cat == 'guest':
-            access_range = 'BETWEEN 2 AND 3'
-        elif access_cat == 'all':
-            access_range = '>= 2'
-        else:
+        if access_cat not in ('member', 'guest', 'all'):
             raise SyntaxError("only 'member' or 'guest' permitted")
 
-        player_data = self.cur.execute(query.format(
-            gender=gender, access_range=access_range), data).fetchall()
+        query = self.get_query(
+            'attendance_query.sql', gender=gender, access_range=access_cat)
+        player_data = self.cur.execute(query, data).fetchall()
         return player_data
 
     def get_unindicated_users(
@@ -744,16 +1122,31 @@ class SqliteEventManager(
         Raises:
             SyntaxError: If the provided access_cat value is not valid.
         """
-        query = self.read_query("unindicated_users.sql")
-
-        if access_cat == "member":
-            query = query.format(access_range='>= 4')
-        elif access_cat == 'guest':
-            query = query.format(access_range='BETWEEN 2 AND 3')
-        elif access_cat == 'all':
-            query = query.format(access_range='>= 2')
-        else:
+        if access_cat not in ('member', 'guest', 'all'):
             raise SyntaxError("only accept 'member', 'guest', 'all'")
+
+        query = self.get_query('unindicated_users.sql', access_range=access_cat)
+        data = self.cur.execute(query, (event_id, )).fetchall()
+
+        return data
+
+    def get_event_roster(self, event_id: int) -> sqlite3.Row:
+        """
+        Retrieve every player relevant to an event in a single query.
+
+        Args:
+            self: The current instance of the class.
+            event_id (int): The ID of the event.
+
+        Returns:
+            data (list): player records with a category field, one of
+                'male', 'female' (attending), 'absent', 'unindicated' (members)
+                or None for records that belong to no category.
+
+        Raises:
+            None
+        """
+        query = self.get_query('event_roster.sql')
         data = self.cur.execute(query, (event_id, )).fetchall()
 
         return data
@@ -778,9 +1171,7 @@ class SqliteUserManager(
         """
         get the access control of the user
         """
-        access = self.cur.execute(
-            "SELECT control_id FROM access_control WHERE player_id = ?",
-            (user_id,)).fetchone()
+        access = self.get_access(user_id)
         if not access:
             return 0
         return access['control_id']
@@ -788,12 +1179,20 @@ class SqliteUserManager(
     def get_future_events(self, event_id, access):
         """
         get event records which are greater than event_id
-        returns sqlite3
+        event_id is usually the start of the day, so every user with
+        the same access shares the cached result
+        returns a list of sqlite3.Row
         """
-        query = self.read_query('future_events.sql')
-        event_data = self.cur.execute(query, (event_id, access)).fetchall()
+        self.sync_caches()
+        key = (self.registry.database, event_id, access)
+        event_data = self.future_events_cache.get(key)
+        if event_data is None:
+            query = self.get_query('future_events.sql')
+            event_data = tuple(
+                self.cur.execute(query, (event_id, access)).fetchall())
+            self.future_events_cache.put(key, event_data)
 
-        return event_data
+        return list(event_data)
 
     def get_attendance_members(
             self,
@@ -814,7 +1213,7 @@ class SqliteUserManager(
             status
             reason
         """
-        query = self.read_query("members_attendance.sql")
+        query = self.get_query('members_attendance.sql')
         data = (event_id, attendance, gender)
         player_data = self.cur.execute(query, data).fetchall()
 
@@ -841,7 +1240,7 @@ class SqliteUserManager(
         Raises:
             None
         """
-        query = self.read_query("user_attending_events.sql")
+        query = self.get_query('user_attending_events.sql')
         data = self.cur.execute(
             query,
             (user_id, event_id, 1, access)
@@ -860,7 +1259,7 @@ class SqliteUserManager(
             0 will query all users
             1 will only query users with notification == 1
         """
-        query = self.read_query('users_record.sql')
+        query = self.get_query('users_record.sql')
         data = self.cur.execute(query, (access, notification)).fetchall()
 
         return data
@@ -869,15 +1268,13 @@ class SqliteUserManager(
         """
         get a list of the access levels in access_control_description
         """
-        access_data = self.cur.execute(
-            'SELECT * FROM access_control_description WHERE id <= 100 ORDER BY id').fetchall()
-        return access_data
+        return self.access_levels().assignable
 
     def get_users_join_on_access(self, access: int):
         """
         get the list of players belonging to that access
         """
-        query = self.read_query("get_players_join_on_access.sql")
+        query = self.get_query('get_players_join_on_access.sql')
         user_data = self.cur.execute(query, (access, )).fetchall()
 
         return user_data
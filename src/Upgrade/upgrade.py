@@ -1,9 +1,204 @@
-
 import logging
+import os
 import sqlite3
 
 
-def upgrade_script(prev_ver, cur_ver, testing):
+def upgrade_2_11(con: sqlite3.Connection):
+    """
+    adds description and accountable fields to events
+    """
+    cur = con.cursor()
+    # take the write lock up front so a running bot cannot interleave writes
+    cur.execute('BEGIN IMMEDIATE')
+    cur.execute("ALTER TABLE events ADD COLUMN description TEXT")
+    cur.execute('ALTER TABLE events ADD COLUMN accountable INT DEFAULT 1')
+    con.commit()
+
+
+def upgrade_2_12(con: sqlite3.Connection):
+    """
+    removes duplicated rows and indexes the lookup columns of
+    attendance, access_control, announcement_entities and kaypoh_messages
+
+    duplicates keep the most recently inserted row,
+    safe to run more than once
+    """
+    cur = con.cursor()
+    cur.execute('BEGIN IMMEDIATE')
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS kaypoh_messages(
+            player_id LONGINT,
+            message_id LONGINT,
+            event_id LONGINT,
+            FOREIGN KEY(player_id) REFERENCES players(id),
+            FOREIGN KEY(event_id) REFERENCES events(id)
+        )""")
+
+    # deduplicate
+    cur.execute(
+        """
+        DELETE FROM attendance WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM attendance GROUP BY event_id, player_id
+        )""")
+    cur.execute(
+        """
+        DELETE FROM access_control WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM access_control GROUP BY player_id
+        )""")
+    cur.execute(
+        """
+        DELETE FROM announcement_entities WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM announcement_entities
+            GROUP BY event_id, entity_type, offset, entity_length
+        )""")
+    cur.execute(
+        """
+        DELETE FROM kaypoh_messages WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM kaypoh_messages GROUP BY event_id, player_id
+        )""")
+
+    # indexes
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS attendance_event_player "
+        "ON attendance(event_id, player_id)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS attendance_player "
+        "ON attendance(player_id)")
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS access_control_player "
+        "ON access_control(player_id)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS announcement_entities_event "
+        "ON announcement_entities(event_id)")
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS kaypoh_messages_event_player "
+        "ON kaypoh_messages(event_id, player_id)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS kaypoh_messages_player "
+        "ON kaypoh_messages(player_id)")
+    con.commit()
+
+
+# tables whose writes are counted in change_log
+TRACKED_TABLES = (
+    'players',
+    'access_control',
+    'access_control_description',
+    'events',
+    'attendance',
+    'announcement_entities',
+    'kaypoh_messages',
+)
+
+
+def upgrade_2_13(con: sqlite3.Connection):
+    """
+    adds change_log, a version counter per table, and attendance_versions,
+    a version counter per event, both kept up to date by triggers.
+    lets every process tell which tables changed since it last looked
+
+    safe to run more than once
+    """
+    cur = con.cursor()
+    cur.execute('BEGIN IMMEDIATE')
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log(
+            table_name TEXT,
+            version INT NOT NULL DEFAULT 0,
+            PRIMARY KEY(table_name)
+        )""")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attendance_versions(
+            event_id LONGINT,
+            version INT NOT NULL DEFAULT 0,
+            PRIMARY KEY(event_id)
+        )""")
+
+    for table in TRACKED_TABLES:
+        cur.execute(
+            "INSERT OR IGNORE INTO change_log VALUES (?, 0)", (table, ))
+        for action in ('INSERT', 'UPDATE', 'DELETE'):
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_{action.lower()}_log
+                AFTER {action} ON {table}
+                BEGIN
+                    UPDATE change_log SET version = version + 1
+                    WHERE table_name = '{table}';
+                END""")
+
+    bump_event = """
+        INSERT INTO attendance_versions VALUES ({row}.event_id, 1)
+        ON CONFLICT(event_id) DO UPDATE SET version = version + 1;"""
+    for action, rows in (('INSERT', ('NEW', )),
+                         ('UPDATE', ('OLD', 'NEW')),
+                         ('DELETE', ('OLD', ))):
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS attendance_{action.lower()}_version
+            AFTER {action} ON attendance
+            BEGIN
+                {''.join(bump_event.format(row=row) for row in rows)}
+            END""")
+    con.commit()
+
+
+def upgrade_2_14(con: sqlite3.Connection):
+    """
+    adds text_hash to kaypoh_messages, the hash of the text
+    last sent to the recipient
+
+    safe to run more than once
+    """
+    cur = con.cursor()
+    cur.execute('BEGIN IMMEDIATE')
+    columns = [row[1] for row in cur.execute('PRAGMA table_info(kaypoh_messages)')]
+    if 'text_hash' not in columns:
+        cur.execute('ALTER TABLE kaypoh_messages ADD COLUMN text_hash TEXT')
+    con.commit()
+
+
+# (version, upgrade) in ascending order of version
+UPGRADES = [
+    (2.11, upgrade_2_11),
+    (2.12, upgrade_2_12),
+    (2.13, upgrade_2_13),
+    (2.14, upgrade_2_14),
+]
+
+
+SCHEMA_FILE = os.path.join('resources', 'create_database.sql')
+
+# seconds an upgrade waits for the bots to release the database
+BUSY_TIMEOUT = 30
+
+
+def create_database(database: str) -> sqlite3.Connection:
+    """
+    creates a database from create_database.sql and applies every upgrade,
+    so that created and upgraded databases end up with the same schema
+
+    returns the open connection
+    """
+    with open(SCHEMA_FILE) as f:
+        # lines starting with . are sqlite3 shell commands
+        schema = ''.join(line for line in f if not line.startswith('.'))
+
+    con = sqlite3.connect(database)
+    con.executescript(schema)
+    for version, upgrade in UPGRADES:
+        upgrade(con)
+    return con
+
+
+def upgrade_script(prev_ver, cur_ver, testing,
+                   database='resources/attendance.db'):
+    """
+    runs every upgrade newer than prev_ver up to and including cur_ver
+    """
     if testing:
         return
     logging.basicConfig(
@@ -11,9 +206,9 @@ def upgrade_script(prev_ver, cur_ver, testing):
     )
     logger = logging.getLogger(__name__)
     logger.info('upgrading from %.2f to %.2f', prev_ver, cur_ver)
-    con = sqlite3.connect('resources/attendance.db')
-    cur = con.cursor()
-    cur.execute('BEGIN TRANSACTION')
-    cur.execute("ALTER TABLE events ADD COLUMN description TEXT")
-    cur.execute('ALTER TABLE events ADD COLUMN accountable INT DEFAULT 1')
-    con.commit()
+    con = sqlite3.connect(database, timeout=BUSY_TIMEOUT)
+    for version, upgrade in UPGRADES:
+        if prev_ver < version <= cur_ver:
+            logger.info('applying upgrade %.2f', version)
+            upgrade(con)
+    con.close()
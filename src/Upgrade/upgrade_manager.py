@@ -26,7 +26,8 @@ class UpgradeManager:
             return False
 
         src.Upgrade.upgrade.upgrade_script(
-            self.config['version'], self.cur_ver, testing=testing)
+            self.config['version'], self.cur_ver, testing=testing,
+            database=self.config.get('database', 'resources/attendance.db'))
         self.finish_version_upgrade(testing=testing)
         return True
 
@@ -0,0 +1,67 @@
+import os
+import json
+import threading
+
+from telegram.bot import Bot
+from telegram.utils.request import Request
+
+
+with open("config.json") as f:
+    CONFIG = json.load(f)
+
+CREDENTIALS_FILE = os.path.join('.secrets', 'bot_credentials.json')
+
+_tokens = None
+_bots = dict()
+_lock = threading.Lock()
+
+
+def get_bot_tokens() -> dict:
+    """
+    returns the tokens in .secrets/bot_credentials.json,
+    the file is only read once
+    """
+    global _tokens
+    with _lock:
+        if _tokens is None:
+            with open(CREDENTIALS_FILE, 'r') as bot_token_file:
+                _tokens = json.load(bot_token_file)
+        return _tokens
+
+
+def training_bot_token() -> str:
+    """
+    token of the training bot, the dev bot in development
+    """
+    bot_tokens = get_bot_tokens()
+    if CONFIG['development']:
+        return bot_tokens['dev_bot']
+    return bot_tokens['training_bot']
+
+
+def pool_size() -> int:
+    """
+    keep alive connections of a Bot client, one for every thread that
+    can call the api at the same time: the broadcast workers, the
+    run_async workers of the dispatcher, and the 4 the Updater asks for
+    (dispatcher, polling, job queue and one spare)
+    """
+    broadcast_workers = CONFIG.get('broadcast', dict()).get('workers', 8)
+    return broadcast_workers + CONFIG.get('bot_workers', 4) + 4
+
+
+def get_bot(token: str) -> Bot:
+    """
+    returns the shared Bot client of token, the Updater of a bot
+    is handed the same client so that there is one pool per token
+
+    every client keeps a pool of pool_size() keep alive connections,
+    so that sends from any thread reuse open connections
+    """
+    with _lock:
+        if token not in _bots:
+            _bots[token] = Bot(
+                token=token,
+                request=Request(con_pool_size=pool_size())
+            )
+        return _bots[token]
@@ -0,0 +1,307 @@
+import json
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from telegram.bot import Bot
+from telegram.error import RetryAfter, TelegramError
+
+from src.bot_clients import get_bot
+
+
+with open("config.json") as f:
+    CONFIG = json.load(f)
+
+BROADCAST_CONFIG = CONFIG.get('broadcast', dict())
+PROGRESS_CONFIG = CONFIG.get('progress', dict())
+
+
+class TokenBucket:
+    """
+    allows rate calls per second with bursts of up to capacity calls
+
+    tokens are reserved in the order acquire is called, so waiting
+    callers are served first come first served
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        takes a token, returns the seconds to wait before it can be used
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self, sleep=time.sleep):
+        wait = self.reserve()
+        if wait > 0:
+            sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        hold back every caller for at least seconds,
+        tokens already reserved are kept in line behind the pause
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def is_full(self) -> bool:
+        """
+        True if the bucket has refilled, it then behaves as a new bucket
+        """
+        with self._lock:
+            now = self.clock()
+            return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class Broadcaster:
+    """
+    sends messages to many chats on a bounded pool of workers
+
+    every message takes a token of the chat it is sent to and
+    a token of the global bucket, which keeps a broadcast under the
+    flood limits of telegram (about 30 messages a second overall
+    and 1 message a second to the same chat). pins only take a global token
+
+    the buckets of at most max_chat_buckets chats are kept,
+    buckets that have refilled are dropped first
+    """
+
+    def __init__(self,
+                 bot: Bot,
+                 workers: int = 8,
+                 global_rate: float = 30,
+                 chat_rate: float = 1,
+                 retries: int = 2,
+                 max_chat_buckets: int = 256,
+                 clock=time.monotonic,
+                 sleep=time.sleep
+                 ):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.retries = retries
+        self.max_chat_buckets = max_chat_buckets
+        self.clock = clock
+        self.sleep = sleep
+
+        self.global_bucket = TokenBucket(global_rate, clock=clock)
+        self.chat_buckets = OrderedDict()  # chat_id -> TokenBucket, least recent first
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='broadcast'
+        )
+
+    def chat_bucket(self, chat_id: int) -> TokenBucket:
+        with self._lock:
+            if chat_id in self.chat_buckets:
+                self.chat_buckets.move_to_end(chat_id)
+                return self.chat_buckets[chat_id]
+
+            # a bucket that has refilled can be dropped without lifting the limit
+            while len(self.chat_buckets) >= self.max_chat_buckets:
+                oldest = next(iter(self.chat_buckets.values()))
+                if not oldest.is_full():
+                    break
+                self.chat_buckets.popitem(last=False)
+
+            bucket = TokenBucket(self.chat_rate, capacity=1, clock=self.clock)
+            self.chat_buckets[chat_id] = bucket
+            return bucket
+
+    def call(self, chat_id: int, method, per_chat: bool = True, **kwargs):
+        """
+        calls method once the rate limits allow it,
+        per_chat = False only waits on the global limit
+
+        when telegram asks to retry after a flood wait, every worker
+        waits out the flood wait before the call is repeated
+        """
+        for attempt in range(self.retries + 1):
+            # wait for the chat first to not hold a global token while waiting
+            if per_chat:
+                self.chat_bucket(chat_id).acquire(self.sleep)
+            self.global_bucket.acquire(self.sleep)
+            try:
+                return method(chat_id=chat_id, **kwargs)
+            except RetryAfter as e:
+                self.global_bucket.pause(e.retry_after)
+                if attempt == self.retries:
+                    raise
+
+    def deliver(self,
+                chat_id: int,
+                msg: str,
+                msg_entities=None,
+                parse_mode=None,
+                pin: bool = False
+                ):
+        """
+        send msg to chat_id, pinning it if pin = True
+        returns none if sending is unsuccessful
+        """
+        try:
+            message_object = self.call(
+                chat_id,
+                self.bot.send_message,
+                text=msg,
+                parse_mode=parse_mode,
+                entities=msg_entities
+            )
+        except TelegramError:
+            return None
+
+        if pin:
+            try:
+                self.call(
+                    chat_id,
+                    self.bot.pin_chat_message,
+                    per_chat=False,
+                    message_id=message_object.message_id,
+                    disable_notification=True
+                )
+            except TelegramError:
+                # the message has been delivered even if it is not pinned
+                pass
+        return message_object
+
+    def edit(self, chat_id: int, message_id: int, text: str, parse_mode=None) -> bool:
+        """
+        edit the text of a sent message
+        returns True if sucessful else False
+        """
+        try:
+            self.call(
+                chat_id,
+                self.bot.edit_message_text,
+                message_id=message_id,
+                text=text,
+                parse_mode=parse_mode
+            )
+        except TelegramError:
+            return False
+        return True
+
+    def run(self, func, items: list):
+        """
+        calls func(item) for every item on the workers
+
+        yields (item, result) as the calls complete
+        """
+        futures = {self._executor.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def broadcast(self, send_list: list, **kwargs):
+        """
+        sends to every row of send_list (rows with an id),
+        kwargs are passed to deliver
+
+        yields (row, message object or none) as the sends complete
+        """
+        return self.run(lambda row: self.deliver(row['id'], **kwargs), send_list)
+
+
+class ProgressReporter:
+    """
+    shows the progress of a broadcast by editing a status message
+
+    edits are coalesced to at most one every interval seconds or every
+    percent of total, whichever comes first, the final state is always shown
+    """
+
+    def __init__(self,
+                 edit,
+                 total: int,
+                 label: str,
+                 interval: float = None,
+                 percent: float = None,
+                 clock=time.monotonic
+                 ):
+        self.edit = edit  # callable taking the text of the status message
+        self.total = total
+        self.label = label
+        self.interval = interval if interval is not None else PROGRESS_CONFIG.get('interval', 2)
+        self.percent = percent if percent is not None else PROGRESS_CONFIG.get('percent', 10)
+        self.clock = clock
+
+        self.done = 0
+        self.edits = 0
+        self.last_text = None
+        self.last_done = 0
+        self.last_time = clock()
+
+    def text(self) -> str:
+        return f"{self.label} {self.done}/{self.total}"
+
+    def update(self, done: int):
+        """
+        record that done sends have completed, the status message
+        is only edited when an interval or a percent step has passed
+        """
+        self.done = done
+        now = self.clock()
+        step = (done - self.last_done) * 100 >= self.percent * self.total
+        if step or now - self.last_time >= self.interval:
+            self._edit(self.text(), now)
+
+    def finish(self, text: str = None):
+        """
+        edit the status message to text, or the last progress if text is None
+        """
+        self._edit(text if text is not None else self.text(), self.clock())
+
+    def _edit(self, text: str, now: float):
+        self.last_done = self.done
+        self.last_time = now
+        # telegram rejects edits that do not change the message
+        if text == self.last_text:
+            return
+        self.edit(text)
+        self.last_text = text
+        self.edits += 1
+
+
+_broadcasters = dict()
+_broadcasters_lock = threading.Lock()
+
+
+def get_broadcaster(token: str) -> Broadcaster:
+    """
+    returns the shared broadcaster of the bot of token, so that
+    broadcasts running at the same time share the rate limits
+
+    the limits are per process. the admin bot and the training bot both
+    send with the training token, so the default global_rate is half of
+    the 30 messages a second telegram allows a token
+    """
+    with _broadcasters_lock:
+        if token not in _broadcasters:
+            _broadcasters[token] = Broadcaster(
+                get_bot(token),
+                workers=BROADCAST_CONFIG.get('workers', 8),
+                global_rate=BROADCAST_CONFIG.get('global_rate', 15),
+                chat_rate=BROADCAST_CONFIG.get('chat_rate', 1)
+            )
+        return _broadcasters[token]
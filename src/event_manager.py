@@ -6,14 +6,42 @@ import json
 from datetime import datetime, timedelta
 from telegram import MessageEntity
 import src.Database.sqlite
+from src.Database.cache import get_cache
 
 
 with open("config.json") as f:
     CONFIG = json.load(f)
-    db = sqlite3.connect(
-        CONFIG['database'],
-        check_same_thread=False
-    )
+
+# parsed fields of events by (database, event id), filled by pull_event
+# and their announcement entities as (type, offset, length) tuples by
+# (database, event id, 'entities'), filled by generate_entities
+event_cache = get_cache('events', maxsize=256, ttl=60)
+
+# fields of EventManager that are kept in event_cache
+CACHED_EVENT_FIELDS = (
+    'event_date',
+    'start_time',
+    'end_time',
+    'event_type',
+    'announcement',
+    'location',
+    'access_control',
+    'description',
+    'accountable',
+)
+
+
+# formatted rosters by (database, event id, attach_usernames, roster version)
+roster_cache = get_cache('rosters', maxsize=128, ttl=30)
+
+
+def invalidate_event(event_id: int, db=src.Database.sqlite.SqliteEventManager()):
+    """
+    drop the cached fields and entities of an event
+    after it is changed in the db
+    """
+    event_cache.invalidate((db.registry.database, event_id))
+    event_cache.invalidate((db.registry.database, event_id, 'entities'))
 
 
 class AttendanceManager:
@@ -80,21 +108,13 @@ class AttendanceManager:
         """
         push attendance update to the db
         """
-
-        if self.record_exists():
-            self.db.update_attendance(
-                user_id=self.user_id,
-                event_id=self.event_id,
-                status=self.status,
-                reason=self.reason
-            )
-        else:
-            self.db.insert_attendance(
-                user_id=self.user_id,
-                event_id=self.event_id,
-                status=self.status,
-                reason=self.reason
-            )
+        self.db.upsert_attendance(
+            user_id=self.user_id,
+            event_id=self.event_id,
+            status=self.status,
+            reason=self.reason
+        )
+        self.exists = True
 
 
 class EventManager:
@@ -202,17 +222,24 @@ class EventManager:
         self.access_control = access
 
     def generate_entities(self):
-        entities = list()
-
-        data = self.db.get_announcement_entities(self.id)
-        for entity in data:
-            entities.append(
-                MessageEntity(
-                    type=entity['entity_type'],
-                    offset=entity['offset'],
-                    length=entity['entity_length']
-                )
+        """
+        build the announcement entities of the event,
+        served from event_cache when possible
+        """
+        self.db.sync_caches()
+        key = (self.db.registry.database, self.id, 'entities')
+        data = event_cache.get(key)
+        if data is None:
+            data = tuple(
+                (entity['entity_type'], entity['offset'], entity['entity_length'])
+                for entity in self.db.get_announcement_entities(self.id)
             )
+            event_cache.put(key, data)
+
+        entities = [
+            MessageEntity(type=entity_type, offset=offset, length=length)
+            for entity_type, offset, length in data
+        ]
 
         self.announcement_entities = entities
         return entities
@@ -232,12 +259,30 @@ class EventManager:
                 access_control INT DEFAULT 2,
                 PRIMARY KEY(id)
 
+        the parsed fields are served from event_cache when possible
+
         returns: bool = True if record exists
         """
+        self.db.sync_caches()
+        fields = event_cache.get((self.db.registry.database, self.id))
+        if fields is not None:
+            for field, value in fields.items():
+                setattr(self, field, value)
+            self.announcement_entities = None
+            self.record_exist = True
+            return True
+
         data = self.db.get_event_by_id(self.id)
         if not data:
             return False
 
+        self.parse_event_data(data)
+        return True
+
+    def parse_event_data(self, data: sqlite3.Row):
+        """
+        fill the fields of the event from a row of the events table
+        """
         # event end timing, type datetime
         self.event_date = datetime.strptime(data["event_date"], "%Y-%m-%d")
         self.start_time = datetime.strptime(data["start_time"], "%H:%M")
@@ -252,7 +297,11 @@ class EventManager:
 
         self.record_exist = True
         self.correct_event_date()
-        return True
+
+        event_cache.put(
+            (self.db.registry.database, self.id),
+            {field: getattr(self, field) for field in CACHED_EVENT_FIELDS}
+        )
 
     def correct_event_date(self):
         event_date = self.event_date
@@ -275,9 +324,17 @@ class TrainingEventManager(EventManager):
     to this instance of the class
     """
 
-    def __init__(self, event_id, record_exist=True):
+    def __init__(self, event_id, record_exist=True, event_data=None):
+        """
+        event_data: optional row of the events table, if given the fields
+        are parsed from it without querying the db and announcement
+        entities are only loaded on generate_entities()
+        """
 
         EventManager.__init__(self, event_id, record_exist=record_exist)
+        if event_data is not None:
+            self.parse_event_data(event_data)
+            return
         self.pull_event()
         self.generate_entities()
 
@@ -322,7 +379,7 @@ class TrainingEventManager(EventManager):
 
             if "reason" not in record.keys():
                 pass
-            elif record["reason"] != "":
+            elif record["reason"]:
                 entry += f" ({record['reason']})"
 
             if record['control_id'] < 4:
@@ -364,45 +421,52 @@ class TrainingEventManager(EventManager):
 
         return data
 
+    def compile_roster(self) -> dict:
+        """
+        queries every player relevant to the event once and
+        sorts them into categories
+
+        returns a dict of records with keys:
+            male, female: attending players
+            absent: absent players
+            unindicated: members that have not indicated
+        """
+        roster = {
+            'male': list(),
+            'female': list(),
+            'absent': list(),
+            'unindicated': list(),
+        }
+
+        for record in self.db.get_event_roster(self.id):
+            if record['category'] in roster:
+                roster[record['category']].append(record)
+
+        return roster
+
     def curate_attendance(self, attach_usernames: int = True) -> tuple:
         """
         queries all the attendance for the said event
         attach_usernames will attach user names to uninidcaited players
 
+        the formatted roster is reused until the attendance version
+        of the event changes
+
         returns a formatted list of players and reasons
         """
-        male_records = list()
-        female_records = list()
-        absentees = list()
-        unindicated = list()
-
-        male_records = self.compile_attendance_by_cat(
-            attendance=1,
-            gender='male',
-            access_cat='all'
-        )
-        male_records = self.attendance_to_str(male_records)
-
-        female_records = self.compile_attendance_by_cat(
-            attendance=1,
-            gender='female',
-            access_cat='all'
-        )
-        female_records = self.attendance_to_str(female_records)
+        key = (self.db.registry.database, self.id, attach_usernames,
+               self.db.attendance_version(self.id))
+        records = roster_cache.get(key)
+        if records is None:
+            roster = self.compile_roster()
+            records = tuple(
+                tuple(self.attendance_to_str(roster[category]))
+                for category in ('male', 'female', 'absent', 'unindicated')
+            )
+            roster_cache.put(key, records)
 
-        absentees = self.compile_attendance_by_cat(
-            attendance=0,
-            gender='both',
-            access_cat='all'
-        )
-        absentees = self.attendance_to_str(absentees)
-
-        unindicated = self.compile_attendance_by_cat(
-            attendance=None,
-            gender='both',
-            access_cat='member'
-        )
-        unindicated = self.attendance_to_str(unindicated)
+        male_records, female_records, absentees, unindicated = (
+            list(category) for category in records)
 
         return male_records, female_records, absentees, unindicated
 
@@ -468,6 +532,8 @@ class AdminEventManager(TrainingEventManager, EventManager):
                 original_event_id=self.original_id,
                 new_event_id=self.id
             )
+        invalidate_event(self.original_id, self.db)
+        invalidate_event(self.id, self.db)
 
     def check_conflicts(self):
         """
@@ -512,6 +578,7 @@ class AdminEventManager(TrainingEventManager, EventManager):
             announcement=self.announcement,
             access_control=self.access_control,
         )
+        invalidate_event(self.id, self.db)
 
     def push_event_to_db(self):
         if self.record_exist:
@@ -524,6 +591,7 @@ class AdminEventManager(TrainingEventManager, EventManager):
         self.db.delete_event_by_id(self.original_id)
         self.db.delete_announcement_entities(self.original_id)
         self.db.delete_many_attendance_on_event(self.original_id)
+        invalidate_event(self.original_id, self.db)
 
     def push_announcement_entities(self):
         if not self.announcement_entities:
@@ -531,6 +599,22 @@ class AdminEventManager(TrainingEventManager, EventManager):
         if self.announcement_entities is None:
             self.generate_entities()
 
-        self.db.delete_announcement_entities(event_id=self.id)
-        self.db.insert_announcement_entities(
+        self.db.replace_announcement_entities(
             event_id=self.id, entities=self.announcement_entities)
+        invalidate_event(self.id, self.db)
+
+
+def pull_training_events(
+        event_ids: list,
+        db=src.Database.sqlite.SqliteEventManager()
+) -> list:
+    """
+    get TrainingEventManagers for event_ids with a single query
+    events that do not exist are left out
+    returns a list ordered by event id
+    """
+    event_data = db.get_events_by_ids(event_ids)
+    return [
+        TrainingEventManager(row['id'], event_data=row)
+        for row in event_data
+    ]
@@ -1,22 +1,37 @@
-import sqlite3
-import os
+import hashlib
 # import logging
 import json
 
+from collections import namedtuple
 from datetime import date, datetime
 
-from telegram.bot import Bot
-from telegram.error import Unauthorized, BadRequest
 from src.event_manager import TrainingEventManager
+import src.Database.sqlite
 import telegram.message
+from src.Database.cache import get_cache
+from src.templates import Template, get_templates
+from src.bot_clients import training_bot_token
+from src.broadcast import get_broadcaster
 
 
 with open("config.json") as f:
     CONFIG = json.load(f)
-    db = sqlite3.connect(
-        CONFIG['database'],
-        check_same_thread=False
-    )
+
+# kaypoh templates with all but the rendered time filled in, by (database,
+# event id, event type, event date, roster version, template version)
+kaypoh_cache = get_cache('kaypoh', maxsize=128, ttl=30)
+
+
+def text_hash(text: str) -> str:
+    """
+    hash stored in kaypoh_messages to tell if a recipient
+    already sees a text
+    """
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+# one edit of a kaypoh message, each recipient gets its own
+KaypohEdit = namedtuple('KaypohEdit', ['chat_id', 'message_id', 'text'])
 
 
 class MessageObject:
@@ -43,27 +58,37 @@ class KaypohMessage(MessageObject, TrainingEventManager):
                  event_id: int,
                  ):
         TrainingEventManager.__init__(self, event_id)
-        with open(os.path.join("resources", "messages", "kaypoh_msg.txt")) as f:
-            self.text = f.read()
-
-        token_file = os.path.join('.secrets', 'bot_credentials.json')
-        with open(token_file, 'r') as bot_token_file:
-            bot_tokens = json.load(bot_token_file)
 
         self.is_dev = CONFIG['development']
-        self.bot_token = bot_tokens['dev_bot']
-
-        if not self.is_dev:
-            self.bot_token = bot_tokens['training_bot']
+        self.bot_token = training_bot_token()
 
     def fill_text_fields(self, date_time_rendered: datetime = None):
         """
         fill text fields inside message template
+        the roster is rendered once per attendance version of the event,
+        only the rendered time is filled in on every call
         """
         if not date_time_rendered:
             date_time_rendered = datetime.now()
         date_time_rendered = date_time_rendered.strftime("%-d-%b %-I:%M%p")
 
+        template = get_templates().get('kaypoh_msg.txt')
+        key = (self.db.registry.database, self.id, self.event_type,
+               self.event_date, self.db.attendance_version(self.id),
+               template.version)
+        cached = kaypoh_cache.get(key)
+        if cached is None:
+            roster = self.render_roster(template)
+            cached = (roster, text_hash(roster.render(date_time_rendered='')))
+            kaypoh_cache.put(key, cached)
+        roster, self.text_hash = cached
+
+        self.text = roster.render(date_time_rendered=date_time_rendered)
+
+    def render_roster(self, template: Template) -> Template:
+        """
+        fill every field of the message template except the rendered time
+        """
         sep = '\n'
         male_records, female_records, absentees, uninidcated = self.curate_attendance(
             attach_usernames=False)
@@ -71,20 +96,19 @@ class KaypohMessage(MessageObject, TrainingEventManager):
         pretty_event_date = self.event_date.strftime(
             '%-d-%b-%y, %a @ %-I:%M%p')
 
-        self.text = self.text.replace('{event_type}', self.event_type)
-        self.text = self.text.replace('{event_date}', pretty_event_date)
-        self.text = self.text.replace(
-            '{total_attendees}', str(total_attendees))
-        self.text = self.text.replace('{n_male}', str(len(male_records)))
-        self.text = self.text.replace('{males}', sep.join(male_records))
-        self.text = self.text.replace('{n_female}', str(len(female_records)))
-        self.text = self.text.replace('{females}', sep.join(female_records))
-        self.text = self.text.replace('{n_absentees}', str(len(absentees)))
-        self.text = self.text.replace('{absentees}', sep.join(absentees))
-        self.text = self.text.replace('{n_unindicated}', str(len(uninidcated)))
-        self.text = self.text.replace('{unindicated}', sep.join(uninidcated))
-        self.text = self.text.replace(
-            '{date_time_rendered}', date_time_rendered)
+        return template.partial(
+            event_type=self.event_type,
+            event_date=pretty_event_date,
+            total_attendees=total_attendees,
+            n_male=len(male_records),
+            males=sep.join(male_records),
+            n_female=len(female_records),
+            females=sep.join(female_records),
+            n_absentees=len(absentees),
+            absentees=sep.join(absentees),
+            n_unindicated=len(uninidcated),
+            unindicated=sep.join(uninidcated),
+        )
 
     def store_message_fields(self,
                              message_object: telegram.message,
@@ -106,13 +130,17 @@ class KaypohMessage(MessageObject, TrainingEventManager):
 
     def add_new_record(self):
         self.db.insert_msg_record(
-            user_id=self.chat_id, message_id=self.message_id, event_id=self.id)
+            user_id=self.chat_id,
+            message_id=self.message_id,
+            event_id=self.id,
+            text_hash=self.text_hash)
 
     def update_record(self):
         self.db.update_msg_record(
             user_id=self.chat_id,
             message_id=self.message_id,
-            event_id=self.id)
+            event_id=self.id,
+            text_hash=self.text_hash)
 
     def push_record(self):
 
@@ -121,33 +149,16 @@ class KaypohMessage(MessageObject, TrainingEventManager):
         else:
             self.add_new_record()
 
-    def update_message(self):
-        """
-        edit the message of the intended recipient
-        returns True if sucessful else False
-        """
-        bot_messenger = Bot(token=self.bot_token)
-        try:
-            bot_messenger.edit_message_text(
-                chat_id=self.chat_id,
-                message_id=self.message_id,
-                text=self.text,
-                parse_mode='html'
-            )
-        except BadRequest:
-            return False
-        except Unauthorized:
-            return False
-        return True
-
 
 class KaypohMessageHandler(KaypohMessage):
     def __init__(self, event_id, rendered_date: datetime = None):
-        KaypohMessage.__init__(self, event_id)
-        if not rendered_date:
-            rendered_date = datetime.now()
-        self.records = None
-        self.fill_text_fields(rendered_date)
+        # event and roster are rendered from the same snapshot
+        with src.Database.sqlite.snapshot():
+            KaypohMessage.__init__(self, event_id)
+            if not rendered_date:
+                rendered_date = datetime.now()
+            self.records = None
+            self.fill_text_fields(rendered_date)
 
     def get_records(self):
         self.records = self.db.get_msg_records(event_id=self.id)
@@ -163,16 +174,34 @@ class KaypohMessageHandler(KaypohMessage):
 
     def update_all_message_instances(self):
         """
-        update all instances of kaypoh messages
+        update all instances of kaypoh messages,
+        recipients who already see the current roster are skipped
+
+        returns the number of successful, failed and skipped edits
         """
         self.get_records()
-        success = 0
-        failed = 0
+        edits = list()
+        previous = dict()  # chat_id -> hash when the refresh started
+        skipped = 0
         for row in self.records:
-            self.chat_id = row['player_id']
-            self.message_id = row['message_id']
-            if self.update_message():
-                success += 1
+            if row['text_hash'] == self.text_hash:
+                skipped += 1
+                continue
+            previous[row['player_id']] = row['text_hash']
+            edits.append(KaypohEdit(row['player_id'], row['message_id'], self.text))
+
+        # edits run concurrently on the shared client within the rate limits
+        broadcaster = get_broadcaster(self.bot_token)
+        updated = list()
+        failed = 0
+        outcomes = broadcaster.run(
+            lambda edit: broadcaster.edit(*edit, parse_mode='html'), edits)
+        for edit, edited in outcomes:
+            if edited:
+                updated.append((edit.chat_id, previous[edit.chat_id]))
             else:
                 failed += 1
-        return success, failed
+
+        if updated:
+            self.db.update_msg_hashes(self.id, updated, self.text_hash)
+        return len(updated), failed, skipped
@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class _Refresh:
+    def __init__(self, first: float, deadline: float):
+        self.first = first  # time of the first request being collected
+        self.deadline = deadline  # time the refresh should run
+        self.running = False
+        self.dirty_since = None  # time of the first request while running
+
+
+class DebouncedScheduler:
+    """
+    collapses refresh requests of the same key into one call of refresh(key)
+
+    a refresh runs window seconds after the last request, but never more than
+    max_delay seconds after the first one. a key has at most one refresh
+    in flight, requests made while it runs are collected into the next refresh
+
+    jobs are scheduled with the run_once of a telegram.ext.JobQueue
+    """
+
+    def __init__(self, refresh, window: float = 5, max_delay: float = 30, clock=time.monotonic):
+        self.refresh = refresh
+        self.window = window
+        self.max_delay = max_delay
+        self.clock = clock
+        self.pending = dict()  # key -> _Refresh
+        self._lock = threading.Lock()
+
+    def request(self, key, job_queue):
+        """
+        ask for key to be refreshed
+        """
+        with self._lock:
+            now = self.clock()
+            state = self.pending.get(key)
+            if state is None:
+                self.pending[key] = _Refresh(now, now + self.window)
+                self._schedule(job_queue, key, self.window)
+            elif state.running:
+                if state.dirty_since is None:
+                    state.dirty_since = now
+            else:
+                state.deadline = min(now + self.window, state.first + self.max_delay)
+
+    def _schedule(self, job_queue, key, delay: float):
+        job_queue.run_once(self._run, max(delay, 0), context=(key, job_queue))
+
+    def _run(self, context):
+        key, job_queue = context.job.context
+        with self._lock:
+            state = self.pending[key]
+            now = self.clock()
+            if now < state.deadline:
+                # more requests came in after the job was scheduled
+                self._schedule(job_queue, key, state.deadline - now)
+                return
+            state.running = True
+
+        try:
+            self.refresh(key)
+        finally:
+            with self._lock:
+                state.running = False
+                if state.dirty_since is None:
+                    del self.pending[key]
+                else:
+                    now = self.clock()
+                    state.first = state.dirty_since
+                    state.deadline = min(now + self.window, state.first + self.max_delay)
+                    state.dirty_since = None
+                    self._schedule(job_queue, key, state.deadline - now)
@@ -0,0 +1,133 @@
+import os
+import re
+import threading
+import time
+
+
+MESSAGE_DIR = os.path.join('resources', 'messages')
+
+# {field} placeholders, other braces are kept as text
+PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+
+class Template:
+    """
+    message template split once into text and {field} segments
+    so that rendering is a single join over the segments
+    """
+
+    def __init__(self, segments: list, version=None):
+        self.segments = tuple(segments)  # text or (field, )
+        self.fields = {
+            segment[0] for segment in self.segments
+            if isinstance(segment, tuple)
+        }
+        self.version = version
+
+    @classmethod
+    def parse(cls, source: str, version=None):
+        segments = list()
+        for i, part in enumerate(PLACEHOLDER.split(source)):
+            if i % 2:
+                segments.append((part, ))
+            elif part:
+                segments.append(part)
+        return cls(segments, version)
+
+    def render(self, **fields) -> str:
+        """
+        fill every placeholder of the template
+
+        Raises:
+            KeyError: if a placeholder is not given
+        """
+        return ''.join(
+            str(fields[segment[0]]) if isinstance(segment, tuple) else segment
+            for segment in self.segments
+        )
+
+    def partial(self, **fields):
+        """
+        returns a template with the given placeholders filled in
+        and the others left for a later render
+        """
+        segments = list()
+        for segment in self.segments:
+            if isinstance(segment, tuple) and segment[0] in fields:
+                segment = str(fields[segment[0]])
+            if isinstance(segment, str) and segments and isinstance(segments[-1], str):
+                segments[-1] += segment
+            else:
+                segments.append(segment)
+        return Template(segments, self.version)
+
+
+class TemplateRegistry:
+    """
+    loads every .txt file in message_dir once,
+    a template is parsed again when its file has been modified.
+    files are checked at most once every check_interval seconds
+    """
+
+    def __init__(self, message_dir: str = MESSAGE_DIR, check_interval: float = 1):
+        self.message_dir = message_dir
+        self.check_interval = check_interval
+
+        self.templates = dict()  # filename -> Template
+        self._mtimes = dict()  # filename -> mtime_ns of the parsed file
+        self._checked = dict()  # filename -> time of the last check
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """
+        read and parse all templates in message_dir
+        """
+        for filename in sorted(os.listdir(self.message_dir)):
+            if filename.endswith('.txt'):
+                self.reload(filename)
+
+    def reload(self, filename: str):
+        path = os.path.join(self.message_dir, filename)
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, encoding='utf-8') as f:
+            template = Template.parse(f.read(), version=mtime)
+        with self._lock:
+            self.templates[filename] = template
+            self._mtimes[filename] = mtime
+            self._checked[filename] = time.monotonic()
+
+    def get(self, filename: str) -> Template:
+        """
+        returns the parsed template of filename
+
+        Raises:
+            KeyError: if there is no such template
+        """
+        now = time.monotonic()
+        if filename not in self._checked:
+            raise KeyError(f"no template {filename} in {self.message_dir}")
+        if now - self._checked[filename] >= self.check_interval:
+            self._checked[filename] = now
+            path = os.path.join(self.message_dir, filename)
+            if os.stat(path).st_mtime_ns != self._mtimes[filename]:
+                self.reload(filename)
+        return self.templates[filename]
+
+    def render(self, filename: str, **fields) -> str:
+        return self.get(filename).render(**fields)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_templates() -> TemplateRegistry:
+    """
+    returns the shared template registry, loading it on first use
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TemplateRegistry()
+        return _registry
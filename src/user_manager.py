@@ -1,5 +1,4 @@
 import sqlite3
-import os
 # import logging
 import json
 
@@ -7,17 +6,15 @@ from datetime import date, datetime
 
 # from src.Database.sqlite import SqliteUserManager
 import src.Database.sqlite
-from telegram.bot import Bot
+from src.templates import get_templates
+from src.bot_clients import get_bot, training_bot_token
+from src.broadcast import get_broadcaster
 from telegram.error import Unauthorized, BadRequest
 import telegram.message
 
 
 with open("config.json") as f:
     CONFIG = json.load(f)
-    db = sqlite3.connect(
-        CONFIG['database'],
-        check_same_thread=False
-    )
 
 
 class UserObj:
@@ -170,6 +167,18 @@ class UserManager:
 
         return event_data
 
+    def push_many_attendance(self,
+                             event_ids: list,
+                             status: int,
+                             reason: str):
+        """
+        set the same attendance for many events in one transaction
+        """
+        self.db.upsert_many_attendance(
+            user_id=self.id,
+            records=[(event_id, status, reason) for event_id in event_ids]
+        )
+
     def attending_events(self, from_date: datetime = None) -> dict:
         """
         returns a dictionary of attending events
@@ -222,15 +231,8 @@ class PlayerAccessRecord(UserManager):
 class AdminUser(UserManager):
     def __init__(self, user):
         super().__init__(user)
-        token_file = os.path.join('.secrets', 'bot_credentials.json')
-        with open(token_file, 'r') as bot_token_file:
-            bot_tokens = json.load(bot_token_file)
-
         self.is_dev = CONFIG['development']
-        self.bot_token = bot_tokens['dev_bot']
-
-        if not self.is_dev:
-            self.bot_token = bot_tokens['training_bot']
+        self.bot_token = training_bot_token()
 
     def get_users_list(self,
                        only_active: bool = True,
@@ -263,7 +265,7 @@ class AdminUser(UserManager):
         send a message to the user on the training bot
         returns none if sending in unsuccessful
         """
-        bot_messenger = Bot(token=self.bot_token)
+        bot_messenger = get_bot(self.bot_token)
         try:
             message_object = bot_messenger.send_message(
                 chat_id=chat_id,
@@ -284,7 +286,7 @@ class AdminUser(UserManager):
         chat_id refers to the user to send to
         message_object is the messsage object to be pinned in chat
         """
-        bot_messenger = Bot(token=self.bot_token)
+        bot_messenger = get_bot(self.bot_token)
         bot_messenger.pin_chat_message(
             chat_id=chat_id,
             message_id=message_object.message_id,
@@ -307,36 +309,36 @@ class AdminUser(UserManager):
         parse_mode type of markdown used, options are 'html' 'markdown'
         parse_mode will be ignored if msg_entities is not None
 
+        messages are sent concurrently within the rate limits of telegram,
+        outcomes are yielded in the order the sends complete
         """
 
-        for row in send_list:
-            telegram_user = f"@{row['telegram_user']}"
-            chat_id = row['id']
-
-            message_object = self.send_message_to_user(
-                chat_id=chat_id,
-                msg=msg,
-                msg_entities=msg_entities,
-                parse_mode=parse_mode
-            )
-
+        broadcaster = get_broadcaster(self.bot_token)
+        outcomes = broadcaster.broadcast(
+            send_list,
+            msg=msg,
+            msg_entities=msg_entities,
+            parse_mode=parse_mode,
+            pin=pin
+        )
+        for row, message_object in outcomes:
             if message_object:
-                if pin:
-                    self.pin_message(chat_id, message_object)
                 yield 'success'
             else:
-                yield telegram_user
+                yield f"@{row['telegram_user']}"
 
     def get_access_levels(self) -> sqlite3.Row:
         """
         based on the access control of the admin user,
         get the levels of access available to the user
         """
-        access_data = self.db.get_access_levels()
+        return self.db.access_levels().levels_for(self.access)
 
-        if self.access != 100:
-            access_data = access_data[1:8]
-        return access_data
+    def access_keyboard(self) -> telegram.InlineKeyboardMarkup:
+        """
+        inline keyboard of the access levels available to the user
+        """
+        return self.db.access_levels().keyboard(self.access)
 
     def select_players_on_access(self, access: int) -> sqlite3.Row:
         """
@@ -350,9 +352,7 @@ class AdminUser(UserManager):
         reads strings from a txt file
         date_string: text to be replaced in the txt file
         """
-        filename = os.path.join("resources", 'messages', 'not_indicated.txt')
-        with open(filename, "r", encoding="utf-8") as text_f:
-            msg = text_f.read().replace("{date}", date_str).rstrip()
+        msg = get_templates().render('not_indicated.txt', date=date_str).rstrip()
         return msg
 
     def generate_player_access_record(self, id):
@@ -1,11 +1,16 @@
 import sqlite3
 
 from datetime import datetime
+from functools import lru_cache
 from telegram import (
     InlineKeyboardButton,
 )
 
 
+PREV_BUTTON = InlineKeyboardButton(text="Prev", callback_data=str(-1))
+NEXT_BUTTON = InlineKeyboardButton(text="Next", callback_data=str(1))
+
+
 def escape_html_tags(text: str) -> str:
     html_tags = {
         "&": "&amp",
@@ -36,41 +41,45 @@ def generate_reason_button(button_state: bool) -> InlineKeyboardButton:
     return InlineKeyboardButton(text=button_text, callback_data=callback_data)
 
 
-def date_buttons(data: sqlite3.Row, page_num=0, pages=True) -> list:
-    buttons = list()
+@lru_cache(maxsize=1024)
+def date_button(event_id: int, event_type: str) -> InlineKeyboardButton:
+    """
+    button of an event in the date pickers,
+    the label is only computed once per event
+    """
+    date_ref = datetime.strptime(str(event_id), "%Y%m%d%H%M")
+    text = f"{date_ref.strftime('%-d-%b-%-y, %a')} ({event_type})"
+    return InlineKeyboardButton(text=text, callback_data=str(event_id))
 
-    if pages:
-        for row_object in data[page_num * 5:page_num * 5 + 5]:
 
-            date_ref = datetime.strptime(str(row_object["id"]), "%Y%m%d%H%M")
-            text = f"{date_ref.strftime('%-d-%b-%-y, %a')} ({row_object['event_type']})"
-            callback_data = str(row_object["id"])
-            button = InlineKeyboardButton(
-                text=text, callback_data=callback_data)
-            buttons.append([button])
+@lru_cache(maxsize=1024)
+def date_time_label(event_id: int) -> str:
+    """
+    date and time of an event id, eg. 7-Jun-23, Wed @ 7:30PM
+    """
+    return datetime.strptime(str(event_id), '%Y%m%d%H%M').strftime(
+        '%-d-%b-%-y, %a @ %-I:%M%p')
+
+
+def date_buttons(data: sqlite3.Row, page_num=0, pages=True) -> list:
+    page = data[page_num * 5:page_num * 5 + 5] if pages else data
+
+    buttons = [
+        [date_button(row_object["id"], row_object["event_type"])]
+        for row_object in page
+    ]
 
+    if pages:
         scroll_buttons = list()
 
         if page_num != 0:
-            scroll_buttons.append(InlineKeyboardButton(
-                text="Prev", callback_data=str(-1)))
+            scroll_buttons.append(PREV_BUTTON)
         if len(data) // 5 != page_num:
-            scroll_buttons.append(InlineKeyboardButton(
-                text="Next", callback_data=str(1)))
+            scroll_buttons.append(NEXT_BUTTON)
 
         buttons.append(scroll_buttons)
 
-        return buttons
-
-    else:
-        for row_object in data:
-            date_ref = datetime.strptime(str(row_object["id"]), "%Y%m%d%H%M")
-            text = f"{date_ref.strftime('%-d-%b-%-y, %a')} ({row_object['event_type']})"
-            callback_data = str(row_object["id"])
-            button = InlineKeyboardButton(
-                text=text, callback_data=callback_data)
-            buttons.append([button])
-        return buttons
+    return buttons
 
 
 def resend_announcement(prev_status, announcement, access) -> bool:
@@ -0,0 +1,24 @@
+import unittest
+
+from telegram.ext import Updater
+
+import src.bot_clients
+
+
+class TestBotClients(unittest.TestCase):
+    def test_shared_client(self):
+        bot = src.bot_clients.get_bot('123456:shared')
+        self.assertIs(src.bot_clients.get_bot('123456:shared'), bot)
+        self.assertIsNot(src.bot_clients.get_bot('654321:other'), bot)
+        self.assertEqual(bot.request.con_pool_size, src.bot_clients.pool_size())
+
+    def test_updater_shares_client(self):
+        bot = src.bot_clients.get_bot('123456:updater')
+        workers = src.bot_clients.CONFIG.get('bot_workers', 4)
+        with self.assertNoLogs('telegram.ext.updater', level='WARNING'):
+            updater = Updater(bot=bot, workers=workers)
+        self.assertIs(updater.bot, bot)
+
+    def test_tokens_read_once(self):
+        self.assertIs(src.bot_clients.get_bot_tokens(),
+                      src.bot_clients.get_bot_tokens())
@@ -0,0 +1,208 @@
+import threading
+import unittest
+
+from telegram.error import RetryAfter, Unauthorized
+
+from src.broadcast import Broadcaster, ProgressReporter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += seconds
+
+
+class FakeMessage:
+    def __init__(self, chat_id, message_id):
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+
+class FakeBot:
+    def __init__(self, blocked=(), flood=()):
+        self.blocked = set(blocked)
+        self.flood = set(flood)
+        self.sent = list()
+        self.pinned = list()
+        self._lock = threading.Lock()
+
+    def send_message(self, chat_id, **kwargs):
+        with self._lock:
+            if chat_id in self.blocked:
+                raise Unauthorized("bot was blocked by the user")
+            if chat_id in self.flood:
+                self.flood.discard(chat_id)
+                raise RetryAfter(1)
+            self.sent.append(chat_id)
+            return FakeMessage(chat_id, len(self.sent))
+
+    def pin_chat_message(self, chat_id, message_id, disable_notification):
+        with self._lock:
+            self.pinned.append((chat_id, message_id))
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        # the next callers queue up behind each other
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+        clock.now = 10
+        self.assertEqual(bucket.reserve(), 0)
+
+    def test_pause(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, clock=clock)
+
+        bucket.pause(3)
+
+        self.assertAlmostEqual(bucket.reserve(), 3.1)
+        self.assertFalse(bucket.is_full())
+        clock.now = 10
+        self.assertTrue(bucket.is_full())
+
+
+class TestBroadcaster(unittest.TestCase):
+    def broadcaster(self, bot, clock, **kwargs):
+        return Broadcaster(
+            bot, workers=4, clock=clock, sleep=clock.sleep, **kwargs
+        )
+
+    def test_outcomes(self):
+        clock = FakeClock()
+        bot = FakeBot(blocked=[2])
+        broadcaster = self.broadcaster(bot, clock)
+        send_list = [{'id': i, 'telegram_user': f'user{i}'} for i in range(1, 6)]
+
+        outcomes = dict(
+            (row['id'], message)
+            for row, message in broadcaster.broadcast(send_list, msg='hi', pin=True)
+        )
+
+        self.assertEqual(set(outcomes), {1, 2, 3, 4, 5})
+        self.assertIsNone(outcomes[2])
+        self.assertEqual(sorted(bot.sent), [1, 3, 4, 5])
+        self.assertEqual(sorted(chat_id for chat_id, _ in bot.pinned), [1, 3, 4, 5])
+
+    def test_retry_after_flood_wait(self):
+        clock = FakeClock()
+        bot = FakeBot(flood=[1])
+        broadcaster = self.broadcaster(bot, clock)
+
+        message = broadcaster.deliver(1, 'hi')
+
+        self.assertEqual(message.chat_id, 1)
+        self.assertGreaterEqual(clock.now, 1)
+
+    def test_global_rate(self):
+        clock = FakeClock()
+        bot = FakeBot()
+        broadcaster = self.broadcaster(bot, clock, global_rate=10)
+        send_list = [{'id': i, 'telegram_user': f'user{i}'} for i in range(40)]
+
+        list(broadcaster.broadcast(send_list, msg='hi'))
+
+        # a burst of 10, the other 30 sends at 10 a second
+        self.assertEqual(len(bot.sent), 40)
+        self.assertGreaterEqual(clock.now, 2.9)
+
+    def test_flood_wait_holds_every_worker(self):
+        clock = FakeClock()
+        bot = FakeBot(flood=[1])
+        broadcaster = self.broadcaster(bot, clock, retries=0)
+
+        self.assertIsNone(broadcaster.deliver(1, 'hi'))
+        broadcaster.deliver(2, 'hi')
+
+        # the send to another chat waits out the flood wait of chat 1
+        self.assertEqual(bot.sent, [2])
+        self.assertGreaterEqual(clock.now, 1)
+
+    def test_chat_rate(self):
+        clock = FakeClock()
+        bot = FakeBot()
+        broadcaster = self.broadcaster(bot, clock, chat_rate=1)
+
+        broadcaster.deliver(1, 'hi', pin=True)
+        # pins are only limited globally
+        self.assertEqual(bot.pinned, [(1, 1)])
+        self.assertLess(clock.now, 1)
+
+        broadcaster.deliver(1, 'hi again')
+        self.assertGreaterEqual(clock.now, 1)
+
+    def test_idle_chat_buckets_evicted(self):
+        clock = FakeClock()
+        broadcaster = self.broadcaster(FakeBot(), clock, max_chat_buckets=3)
+
+        for chat_id in range(3):
+            broadcaster.deliver(chat_id, 'hi')
+        # chat 0 has not refilled yet, so it is kept
+        broadcaster.deliver(3, 'hi')
+        self.assertEqual(list(broadcaster.chat_buckets), [0, 1, 2, 3])
+
+        clock.now += 10
+        broadcaster.deliver(4, 'hi')
+        self.assertEqual(len(broadcaster.chat_buckets), 3)
+        self.assertEqual(list(broadcaster.chat_buckets)[-1], 4)
+
+
+class TestProgressReporter(unittest.TestCase):
+    def test_coalesced_edits(self):
+        clock = FakeClock()
+        edits = list()
+        progress = ProgressReporter(
+            edits.append, total=100, label='sending',
+            interval=5, percent=25, clock=clock
+        )
+
+        for done in range(1, 101):
+            clock.now += 0.01
+            progress.update(done)
+        progress.finish('done')
+
+        self.assertEqual(
+            edits,
+            ['sending 25/100', 'sending 50/100', 'sending 75/100',
+             'sending 100/100', 'done']
+        )
+
+    def test_interval(self):
+        clock = FakeClock()
+        edits = list()
+        progress = ProgressReporter(
+            edits.append, total=1000, label='sending',
+            interval=2, percent=50, clock=clock
+        )
+
+        for done in range(1, 11):
+            clock.now += 1
+            progress.update(done)
+
+        self.assertEqual(edits, [f'sending {done}/1000' for done in (2, 4, 6, 8, 10)])
+
+    def test_final_state_flushed_once(self):
+        clock = FakeClock()
+        edits = list()
+        progress = ProgressReporter(
+            edits.append, total=10, label='sending',
+            interval=60, percent=100, clock=clock
+        )
+
+        progress.update(3)
+        progress.finish()
+        progress.finish()
+
+        self.assertEqual(edits, ['sending 3/10'])
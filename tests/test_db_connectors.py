@@ -1,7 +1,18 @@
 import src.Database.sqlite
+import src.Database.connection
+import src.Database.query_registry
+import src.Database.executor
+import src.Database.cache
+import src.Upgrade.upgrade
 import unittest
 import os
 import sqlite3
+import tempfile
+import threading
+
+from queue import Queue
+from telegram import Bot, User
+from telegram.ext import Dispatcher, TypeHandler
 
 """
 test_event_id = 12345678, 12345677, 12345676
@@ -29,6 +40,377 @@ class TestSqlite(unittest.TestCase):
         self.assertEqual(query, test_read, "not the same query")
 
 
+class TestQueryRegistry(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.registry = src.Database.query_registry.get_query_registry()
+
+    def test_all_queries_loaded(self):
+        query_dir = os.path.join('src', 'Database', 'queries')
+        q_files = [q for q in os.listdir(query_dir) if q.endswith('.sql')]
+        self.assertCountEqual(self.registry.queries, q_files)
+
+    def test_variant_preformatted(self):
+        statement = self.registry.get(
+            'attendance_query.sql', gender='male', access_range='all')
+        expected = self.registry.read('attendance_query.sql').format(
+            gender="AND gender = 'Male'", access_range='>= 2')
+        self.assertEqual(statement, expected)
+        self.assertIs(statement, self.registry.get(
+            'attendance_query.sql', access_range='all', gender='male'))
+
+    def test_dynamic_statement_reused(self):
+        first = self.registry.get('update_user.sql', update_columns='name = ?')
+        second = self.registry.get('update_user.sql', update_columns='name = ?')
+        self.assertIs(first, second)
+
+    def test_unknown_variant(self):
+        with self.assertRaises(KeyError):
+            self.registry.get('attendance_query.sql', gender='x', access_range='all')
+
+    def test_unknown_placeholder(self):
+        with tempfile.TemporaryDirectory() as query_dir:
+            with open(os.path.join(query_dir, 'bad.sql'), 'w') as f:
+                f.write('SELECT * FROM players WHERE {unknown}')
+            with self.assertRaises(ValueError):
+                src.Database.query_registry.QueryRegistry(query_dir)
+
+
+class TestDatabaseExecutor(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.executor = src.Database.executor.get_executor()
+
+    def test_write_on_writer_thread(self):
+        thread_name = self.executor.write(
+            lambda: threading.current_thread().name).result()
+        self.assertTrue(thread_name.startswith(
+            src.Database.executor.WRITER_THREAD_NAME))
+
+    def test_gather_reads(self):
+        results = self.executor.gather(
+            self.executor.read(pow, 2, 3),
+            self.executor.read(pow, 3, 2),
+        )
+        self.assertEqual(results, [8, 9])
+
+    def test_serialized_write(self):
+        class Connector:
+            con = sqlite3.connect(':memory:', check_same_thread=False)
+
+            @src.Database.executor.serialized_write
+            def write(self):
+                self.con.execute('BEGIN TRANSACTION')
+                raise ValueError(threading.current_thread().name)
+
+        connector = Connector()
+        with self.assertRaises(ValueError) as error:
+            connector.write()
+        self.assertTrue(str(error.exception).startswith(
+            src.Database.executor.WRITER_THREAD_NAME))
+        self.assertFalse(connector.con.in_transaction,
+                         "failed writes should be rolled back")
+
+    def test_dispatcher_not_blocked_by_slow_write(self):
+        commit = threading.Event()
+        answered = threading.Event()
+
+        class Connector:
+            @src.Database.executor.serialized_write
+            def slow_write(self):
+                commit.wait(5)
+
+        def write_handler(update, context):
+            Connector().slow_write()
+
+        def read_handler(update, context):
+            src.Database.sqlite.SqliteUserManager().get_user_access(1234567)
+            answered.set()
+
+        update_queue = Queue()
+        # the worker threads are named after bot.id, a Bot would ask the api for it
+        bot = Bot('123456:dispatcher')
+        bot._bot = User(123456, 'dispatcher', is_bot=True)
+        dispatcher = Dispatcher(bot, update_queue, workers=2)
+        # registered like the conversation handlers of the bots
+        dispatcher.add_handler(TypeHandler(int, write_handler, run_async=True))
+        dispatcher.add_handler(TypeHandler(str, read_handler, run_async=True))
+        ready = threading.Event()
+        dispatcher_thread = threading.Thread(
+            target=dispatcher.start, kwargs={'ready': ready}, daemon=True)
+        dispatcher_thread.start()
+        ready.wait(5)
+        try:
+            update_queue.put(1)
+            update_queue.put('button press')
+            self.assertTrue(answered.wait(2),
+                            "a slow commit should not hold up other handlers")
+        finally:
+            commit.set()
+            dispatcher.stop()
+            dispatcher_thread.join(5)
+
+
+class TestConnectionRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.registry = src.Database.connection.ConnectionRegistry(
+            os.path.join(self.tmp_dir.name, 'test.db'),
+            pool_size=2,
+            timeout=0.1
+        )
+
+    def tearDown(self):
+        self.registry.release()
+        self.registry.close_idle()
+        self.tmp_dir.cleanup()
+
+    def get_connection_in_thread(self):
+        output = dict()
+
+        def target():
+            output['con'] = self.registry.get_connection()
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+        return output['con']
+
+    def test_same_thread_same_connection(self):
+        self.assertIs(self.registry.get_connection(),
+                      self.registry.get_connection())
+
+    def test_connectors_share_registry(self):
+        users_db = src.Database.sqlite.UsersTableSqlite()
+        events_db = src.Database.sqlite.EventsTableSqlite()
+        self.assertIs(users_db.registry, events_db.registry)
+        self.assertIs(users_db.con, events_db.con)
+
+    def test_finished_thread_returns_connection(self):
+        first = self.get_connection_in_thread()
+        second = self.get_connection_in_thread()
+        self.assertIs(first, second, "idle connection should be reused")
+        self.assertEqual(self.registry.n_connections(), 1)
+
+    def test_pool_is_bounded(self):
+        self.registry.get_connection()
+        con = self.registry.acquire()
+        with self.assertRaises(TimeoutError):
+            self.registry.acquire()
+        self.registry.release_connection(con)
+        self.assertEqual(self.registry.n_connections(), 2)
+
+    def test_check_pool_size(self):
+        workers = src.Database.connection.CONFIG.get('bot_workers', 4)
+        src.Database.connection.check_pool_size(workers)
+        required = src.Database.connection.required_pool_size(workers)
+        with self.assertRaises(ValueError):
+            src.Database.connection.check_pool_size(workers, pool_size=required - 1)
+
+
+class TestDurabilityProfile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.registry = src.Database.connection.ConnectionRegistry(
+            os.path.join(self.tmp_dir.name, 'test.db'),
+            profile={
+                "journal_mode": "WAL",
+                "busy_timeout": 5000,
+                "synchronous": "NORMAL",
+                "cache_size": -8000
+            }
+        )
+
+    def tearDown(self):
+        self.registry.release()
+        self.registry.close_idle()
+        self.tmp_dir.cleanup()
+
+    def test_profile_applied(self):
+        con = self.registry.get_connection()
+        self.assertEqual(con.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(con.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+        self.assertEqual(con.execute('PRAGMA synchronous').fetchone()[0], 1)
+        self.assertEqual(con.execute('PRAGMA cache_size').fetchone()[0], -8000)
+
+    def test_invalid_profile(self):
+        with self.assertRaises(ValueError):
+            src.Database.connection.profile_pragmas({'journal_mode': 'WAL; DROP TABLE players'})
+        with self.assertRaises(ValueError):
+            src.Database.connection.profile_pragmas({'page_size': 4096})
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = src.Database.cache.TTLCache(
+            maxsize=2, ttl=10, clock=lambda: self.now)
+
+    def test_expiry(self):
+        self.cache.put('a', 1)
+        self.now = 9
+        self.assertEqual(self.cache.get('a'), 1)
+        self.now = 10
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'size': 0})
+
+    def test_lru_eviction(self):
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.get('a')
+        self.cache.put('c', 3)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'), 'least recently used is evicted')
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_invalidate(self):
+        self.cache.put('a', 1)
+        self.cache.invalidate('a')
+        self.assertEqual(self.cache.get('a', 'missing'), 'missing')
+
+
+class TestReadOnlySnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp_dir.name, 'test.db')
+        self.registry = src.Database.connection.get_registry(self.database)
+        con = self.registry.get_connection()
+        con.execute('CREATE TABLE players(id INT)')
+        con.execute('INSERT INTO players VALUES (1)')
+        con.commit()
+
+        self.connector = src.Database.sqlite.Sqlite()
+        self.connector.registry = self.registry
+
+    def tearDown(self):
+        read_only = src.Database.connection.get_registry(
+            self.database, read_only=True)
+        for registry in (self.registry, read_only):
+            registry.release()
+            registry.close_idle()
+        self.tmp_dir.cleanup()
+
+    def count(self):
+        return self.connector.con.execute(
+            'SELECT COUNT(*) FROM players').fetchone()[0]
+
+    def test_read_only_connection(self):
+        with self.connector.snapshot() as con:
+            self.assertIs(self.connector.con, con)
+            self.assertIsNot(con, self.registry.get_connection())
+            with self.assertRaises(sqlite3.OperationalError):
+                con.execute('INSERT INTO players VALUES (2)')
+        self.assertIs(self.connector.con, self.registry.get_connection())
+
+    def test_snapshot_is_consistent(self):
+        def write():
+            con = self.registry.get_connection()
+            con.execute('INSERT INTO players VALUES (2)')
+            con.commit()
+
+        with self.connector.snapshot():
+            self.assertEqual(self.count(), 1)
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+            self.assertEqual(self.count(), 1)
+            with self.connector.snapshot():
+                self.assertEqual(self.count(), 1)
+        self.assertEqual(self.count(), 2)
+
+
+class TestQueryPlans(unittest.TestCase):
+    """
+    runs connector methods against an upgraded schema and checks
+    that every SELECT they issue is answered through an index
+    """
+    @classmethod
+    def setUpClass(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        database = os.path.join(self.tmp_dir.name, 'test.db')
+
+        src.Upgrade.upgrade.create_database(database).close()
+
+        self.registry = src.Database.connection.ConnectionRegistry(database)
+
+    @classmethod
+    def tearDownClass(self):
+        self.registry.release()
+        self.registry.close_idle()
+        self.tmp_dir.cleanup()
+
+    def query_plans(self, connector, method, *args, **kwargs) -> list:
+        connector.registry = self.registry
+        con = self.registry.get_connection()
+        src.Database.sqlite.AccessTableSqlite.access_cache.clear()
+
+        statements = list()
+        con.set_trace_callback(statements.append)
+        try:
+            getattr(connector, method)(*args, **kwargs)
+        finally:
+            con.set_trace_callback(None)
+
+        plans = list()
+        for statement in statements:
+            if not statement.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = con.execute(f'EXPLAIN QUERY PLAN {statement}').fetchall()
+            plans.append(' | '.join(row['detail'] for row in plan))
+        return plans
+
+    def assertUsesIndex(self, plans, index):
+        self.assertGreater(len(plans), 0, 'no SELECT was issued')
+        for plan in plans:
+            self.assertIn(index, plan)
+            self.assertNotRegex(plan, r'SCAN (attendance|access_control|announcement_entities|kaypoh_messages)')
+
+    def test_get_attendance(self):
+        plans = self.query_plans(
+            src.Database.sqlite.AttendanceTableSqlite(), 'get_attendance',
+            user_id=1, event_id=2)
+        self.assertUsesIndex(plans, 'attendance_event_player')
+
+    def test_get_access(self):
+        plans = self.query_plans(
+            src.Database.sqlite.AccessTableSqlite(), 'get_access', 1)
+        self.assertUsesIndex(plans, 'access_control_player')
+
+    def test_get_user_access(self):
+        plans = self.query_plans(
+            src.Database.sqlite.SqliteUserManager(), 'get_user_access', 1)
+        self.assertUsesIndex(plans, 'access_control_player')
+
+    def test_get_announcement_entities(self):
+        plans = self.query_plans(
+            src.Database.sqlite.AnnouncementEntitySqlite(),
+            'get_announcement_entities', 1)
+        self.assertUsesIndex(plans, 'announcement_entities_event')
+
+    def test_get_msg_records(self):
+        db = src.Database.sqlite.MessageTableSqlite()
+        self.assertUsesIndex(
+            self.query_plans(db, 'get_msg_records', event_id=1),
+            'kaypoh_messages_event_player')
+        self.assertUsesIndex(
+            self.query_plans(db, 'get_msg_records', event_id=1, user_id=2),
+            'kaypoh_messages_event_player')
+        self.assertUsesIndex(
+            self.query_plans(db, 'get_msg_records', user_id=2),
+            'kaypoh_messages_player')
+
+    def test_get_event_roster(self):
+        plans = self.query_plans(
+            src.Database.sqlite.SqliteEventManager(), 'get_event_roster', 1)
+        self.assertUsesIndex(plans, 'attendance_event_player')
+
+    def test_get_unindicated_users(self):
+        plans = self.query_plans(
+            src.Database.sqlite.SqliteEventManager(),
+            'get_unindicated_users', 1, access_cat='member')
+        self.assertUsesIndex(plans, 'attendance_event_player')
+
+
 class TestUserTablesSqlite(unittest.TestCase):
     @classmethod
     def setUpClass(self):
@@ -147,6 +529,11 @@ class TestEventsTableSqlite(unittest.TestCase):
         self.assertIsNone(
             deleted_event, "event should be deleted and shouldnt exist")
 
+    def test_get_events_by_ids(self):
+        event_data = self.db.get_events_by_ids([12345678, 111, 12345676])
+        self.assertEqual([row['id'] for row in event_data], [12345676, 12345678])
+        self.assertEqual(self.db.get_events_by_ids([]), list())
+
     def test_update_event(self):
         event_exists = self.db.get_event_by_id(12345678)
 
@@ -223,6 +610,38 @@ class TestAttendanceTableSqlite(unittest.TestCase):
             user_id=1234567, event_id=12345676, status=1, reason=None)
         self.assertEqual(attendance['status'], 0)
 
+    def test_upsert_attendance_record(self):
+        self.db.upsert_attendance(
+            user_id=111, event_id=111, status=1, reason="")
+        inserted = self.db.get_attendance(user_id=111, event_id=111)
+        self.db.upsert_attendance(
+            user_id=111, event_id=111, status=0, reason="test")
+        updated = self.db.get_attendance(user_id=111, event_id=111)
+        n_records = self.db.cur.execute(
+            "SELECT COUNT(*) FROM attendance WHERE player_id = 111 AND event_id = 111"
+        ).fetchone()[0]
+        self.db.delete_attendance(user_id=111, event_id=111)
+
+        self.assertEqual(inserted['status'], 1)
+        self.assertEqual(updated['status'], 0)
+        self.assertEqual(updated['reason'], 'test')
+        self.assertEqual(n_records, 1, "upsert should not duplicate records")
+
+    def test_upsert_many_attendance_records(self):
+        self.db.upsert_attendance(
+            user_id=111, event_id=111, status=1, reason="")
+        self.db.upsert_many_attendance(
+            user_id=111,
+            records=[(111, 0, "test"), (112, 0, "test")]
+        )
+        first = self.db.get_attendance(user_id=111, event_id=111)
+        second = self.db.get_attendance(user_id=111, event_id=112)
+        self.db.delete_attendance(user_id=111, event_id=111)
+        self.db.delete_attendance(user_id=111, event_id=112)
+
+        self.assertEqual(first['status'], 0)
+        self.assertEqual(second['reason'], "test")
+
 
 class TestSqliteUserManager(unittest.TestCase):
 
@@ -261,6 +680,64 @@ class TestSqliteUserManager(unittest.TestCase):
         self.assertEqual(
             access, 0, "needs to return 0 when no access level found")
 
+    def test_writes_of_other_processes(self):
+        other_process = sqlite3.connect(self.db.registry.database)
+        version = self.db.table_version('access_control')
+        self.assertEqual(self.db.get_user_access(1234567), 4)
+
+        other_process.execute(
+            'UPDATE access_control SET control_id = 5 WHERE player_id = 1234567')
+        other_process.commit()
+        changed = self.db.changed_since('access_control', version)
+        access = self.db.get_user_access(1234567)
+
+        other_process.execute(
+            'UPDATE access_control SET control_id = 4 WHERE player_id = 1234567')
+        other_process.commit()
+        other_process.close()
+
+        self.assertTrue(changed)
+        self.assertFalse(self.db.changed_since(
+            'events', self.db.table_version('events')))
+        self.assertEqual(access, 5, "cached access should be dropped")
+
+    def test_future_events_invalidated(self):
+        before = self.db.get_future_events(event_id=0, access=2)
+        hits = self.db.future_events_cache.hits
+        self.assertEqual(self.db.get_future_events(event_id=0, access=2), before)
+        self.assertEqual(self.db.future_events_cache.hits, hits + 1)
+
+        self.db.insert_event(
+            id=111,
+            event_type='test type',
+            event_date="1998-08-03",
+            start_time="13:00",
+            end_time="14:00",
+            location="test location",
+            description="",
+            accountable=1,
+            access_control=2,
+            announcement=None
+        )
+        inserted = self.db.get_future_events(event_id=0, access=2)
+        self.db.delete_event_by_id(111)
+        deleted = self.db.get_future_events(event_id=0, access=2)
+
+        self.assertIn(111, [row['id'] for row in inserted])
+        self.assertNotIn(111, [row['id'] for row in deleted])
+
+    def test_user_access_invalidated(self):
+        self.assertEqual(self.db.get_user_access(666), 0)
+        self.db.insert_access(user_id=666, access=4)
+        self.assertEqual(self.db.get_user_access(666), 4)
+        self.db.update_access(user_id=666, new_access=5)
+        self.assertEqual(self.db.get_user_access(666), 5)
+        hits = self.db.access_cache.hits
+        self.assertEqual(self.db.get_user_access(666), 5)
+        self.assertEqual(self.db.access_cache.hits, hits + 1)
+        self.db.delete_user_access(666)
+        self.assertEqual(self.db.get_user_access(666), 0)
+
     def test_get_attending_events(self):
         data = self.db.get_attending_events(
             user_id=1234567, event_id=0, access=4)
@@ -270,6 +747,36 @@ class TestSqliteUserManager(unittest.TestCase):
     def test_get_access_levels(self):
         self.db.get_access_levels()
 
+    def test_access_level_catalogue(self):
+        catalogue = self.db.access_levels()
+        self.assertIs(self.db.access_levels(), catalogue,
+                      "catalogue is only reloaded when the db changes")
+        self.assertEqual(catalogue.description(4), 'Member')
+        self.assertEqual(
+            [row['id'] for row in catalogue.levels_for(5)],
+            list(range(1, 8)))
+        self.assertIs(catalogue.keyboard(5), catalogue.keyboard(5))
+        buttons = catalogue.keyboard(100).inline_keyboard
+        self.assertEqual(len(buttons), len(catalogue.rows))
+        self.assertEqual(buttons[0][0].callback_data, '0')
+
+    def test_access_level_above_super_user(self):
+        self.db.cur.execute(
+            "INSERT INTO access_control_description VALUES (101, 'Retired')")
+        self.db.con.commit()
+        self.addCleanup(self._delete_access_level, 101)
+
+        catalogue = self.db.access_levels()
+        self.assertEqual(self.db.get_position(101), 'Retired')
+        self.assertNotIn(101, [row['id'] for row in catalogue.levels_for(100)])
+        self.assertEqual(
+            len(catalogue.keyboard(100).inline_keyboard), len(catalogue.rows) - 1)
+
+    def _delete_access_level(self, access):
+        self.db.cur.execute(
+            'DELETE FROM access_control_description WHERE id = ?', (access, ))
+        self.db.con.commit()
+
     def test_get_access_join_on_users(self):
         users = self.db.get_users_join_on_access(100)
         self.assertEqual(len(users), 1)
@@ -311,6 +818,25 @@ class TestSqliteEventManager(unittest.TestCase):
             print(item['name'])
         self.assertIsNotNone(users)
 
+    def test_get_unindicated_same_name(self):
+        self.db.insert_user(
+            id=666,
+            telegram_user='testes',
+            name='Jacob Jason',
+            gender='Male',
+        )
+        self.db.insert_access(user_id=666, access=4)
+        users = self.db.get_unindicated_users(
+            event_id=12345678,
+            access_cat='member'
+        )
+        self.db.delete_user_by_id(666)
+        self.db.delete_user_access(666)
+
+        user_ids = [user['id'] for user in users]
+        self.assertIn(666, user_ids, "players are matched on id, not name")
+        self.assertNotIn(1234567, user_ids)
+
 
 class TestMessageTableSqlite(unittest.TestCase):
     @classmethod
@@ -337,7 +863,18 @@ class TestMessageTableSqlite(unittest.TestCase):
         deleted = self.db.get_msg_records(event_id=123)
         self.assertIsNotNone(data)
         self.assertEqual(deleted, list())
-        
+
+    def test_msg_hashes(self):
+        self.db.insert_msg_record(user_id=123, event_id=123, message_id=1, text_hash='a')
+        self.db.insert_msg_record(user_id=124, event_id=123, message_id=2)
+        self.db.update_msg_hashes(123, [(123, 'a'), (124, None)], 'b')
+        # a newer text was stored after the refresh read 'b'
+        self.db.update_msg_record(user_id=123, message_id=1, event_id=123, text_hash='c')
+        self.db.update_msg_hashes(123, [(123, 'b')], 'old')
+        hashes = [row['text_hash'] for row in self.db.get_msg_records(event_id=123)]
+        self.db.delete_msg_record(user_id=123, event_id=123)
+        self.db.delete_msg_record(user_id=124, event_id=123)
+        self.assertEqual(hashes, ['c', 'b'])
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@ import unittest
 
 import src.event_manager
 import src.Database.sqlite
+from telegram import MessageEntity
 
 
 class TestAttendanceManager(unittest.TestCase):
@@ -57,6 +58,23 @@ class TestAttendanceManager(unittest.TestCase):
         self.assertIsNotNone(attendance_record.reason,
                              msg=f"reason: {attendance_record.reason}")
 
+    def test_attendance_update_records(self):
+        attendance_record = src.event_manager.AttendanceManager(
+            user_id=111,
+            event_id=self.event_id_2
+        )
+        attendance_record.set_status(1)
+        attendance_record.set_reason("test")
+        attendance_record.update_records()
+        pushed = src.event_manager.AttendanceManager(
+            user_id=111,
+            event_id=self.event_id_2
+        )
+        self.db.delete_attendance(user_id=111, event_id=self.event_id_2)
+
+        self.assertTrue(attendance_record.record_exists())
+        self.assertEqual(pushed.pretty_attendance(), "Yes (test)")
+
     def test_announcement_entities(self):
         event_instance = src.event_manager.EventManager(self.event_id_cohesion)
         event_instance.generate_entities()
@@ -99,6 +117,46 @@ class TestAttendanceManager(unittest.TestCase):
         print(unindicated)
         self.assertIsNotNone(male_records)
 
+    def test_curate_attendance_matches_categories(self):
+        event_instance = src.event_manager.TrainingEventManager(
+            self.event_id_jb
+        )
+        expected = (
+            event_instance.compile_attendance_by_cat(1, 'male', 'all'),
+            event_instance.compile_attendance_by_cat(1, 'female', 'all'),
+            event_instance.compile_attendance_by_cat(0, 'both', 'all'),
+            event_instance.compile_attendance_by_cat(None, 'both', 'member'),
+        )
+        expected = tuple(
+            event_instance.attendance_to_str(records) for records in expected
+        )
+        self.assertEqual(event_instance.curate_attendance(), expected)
+
+    def test_curate_attendance_versioned(self):
+        event_instance = src.event_manager.TrainingEventManager(
+            self.event_id_jb
+        )
+        before = event_instance.curate_attendance()
+        hits = src.event_manager.roster_cache.hits
+        self.assertEqual(event_instance.curate_attendance(), before)
+        self.assertEqual(src.event_manager.roster_cache.hits, hits + 1)
+
+        original = self.db.get_attendance(self.user_id, self.event_id_jb)
+        self.addCleanup(self._restore_attendance, original)
+        self.db.upsert_attendance(
+            self.user_id, self.event_id_jb, 1, 'roster version')
+
+        self.assertNotEqual(event_instance.curate_attendance(), before,
+                            "attendance writes should bump the roster version")
+
+    def _restore_attendance(self, original):
+        if original is None:
+            self.db.delete_attendance(self.user_id, self.event_id_jb)
+        else:
+            self.db.upsert_attendance(
+                self.user_id, self.event_id_jb,
+                original['status'], original['reason'])
+
 
 class TestEventManager(unittest.TestCase):
 
@@ -120,6 +178,16 @@ class TestEventManager(unittest.TestCase):
         self.assertIsNotNone(event_instance.event_date,
                              "fields should be filled up")
 
+    def test_pull_training_events(self):
+        events = src.event_manager.pull_training_events(
+            [self.event_id_cohesion, 111, self.event_id_jb])
+        single = src.event_manager.TrainingEventManager(self.event_id_jb)
+
+        self.assertEqual([event.id for event in events],
+                         [self.event_id_jb, self.event_id_cohesion])
+        self.assertEqual(events[0].get_event_date(), single.get_event_date())
+        self.assertEqual(events[0].end_time, single.end_time)
+
     def test_admin_event_instantiation(self):
         event_instance = src.event_manager.AdminEventManager(
             id=self.event_id_jb,
@@ -150,3 +218,50 @@ class TestEventManager(unittest.TestCase):
         event_instance.update_event_records()
         self.assertIsNotNone(event_exists)
         self.assertIsNotNone(attendance_exist)
+
+    def test_event_cache(self):
+        key = (self.db.registry.database, self.event_id_jb)
+        src.event_manager.event_cache.invalidate(key)
+        src.event_manager.TrainingEventManager(self.event_id_jb)
+        hits = src.event_manager.event_cache.hits
+
+        event_instance = src.event_manager.AdminEventManager(
+            id=self.event_id_jb,
+            record_exist=True
+        )
+        # event fields and announcement entities
+        self.assertEqual(src.event_manager.event_cache.hits, hits + 2)
+
+        location = event_instance.location
+        event_instance.set_location('cache test')
+        event_instance.update_event_records()
+        cached = src.event_manager.TrainingEventManager(self.event_id_jb)
+        event_instance.set_location(location)
+        event_instance.update_event_records()
+
+        self.assertEqual(cached.location, 'cache test',
+                         "updates should invalidate the cached event")
+        self.assertEqual(cached.get_event_date(), event_instance.get_event_date())
+
+    def test_announcement_entities_cached(self):
+        event_instance = src.event_manager.AdminEventManager(
+            id=self.event_id_cohesion,
+            record_exist=True
+        )
+        original = event_instance.generate_entities()
+        hits = src.event_manager.event_cache.hits
+        self.assertEqual(event_instance.generate_entities(), original)
+        self.assertEqual(src.event_manager.event_cache.hits, hits + 1)
+
+        event_instance.set_entities(
+            [MessageEntity(type='italic', offset=1, length=2)])
+        event_instance.push_announcement_entities()
+        replaced = src.event_manager.TrainingEventManager(
+            self.event_id_cohesion).announcement_entities
+        event_instance.set_entities(original)
+        event_instance.push_announcement_entities()
+
+        self.assertEqual(replaced, [MessageEntity(type='italic', offset=1, length=2)])
+        self.assertEqual(
+            self.db.get_announcement_entities(self.event_id_cohesion)[0]['entity_type'],
+            original[0].type)
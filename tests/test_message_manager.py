@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+from datetime import datetime
+from unittest import mock
+
+import src.message_manager
+import src.Database.sqlite
+from src.broadcast import Broadcaster
+
+
+class FakeBot:
+    def __init__(self):
+        self.edits = list()
+        self._lock = threading.Lock()
+
+    def edit_message_text(self, chat_id, message_id, text, parse_mode):
+        with self._lock:
+            self.edits.append((chat_id, message_id))
+
+
+class TestKaypohMessageHandler(unittest.TestCase):
+    def setUp(self):
+        self.event_id = 202305272000
+        self.player_id = 89637568
+        self.db = src.Database.sqlite.MessageTableSqlite()
+        self.bot = FakeBot()
+        broadcaster = Broadcaster(self.bot, workers=4, sleep=lambda seconds: None)
+        patcher = mock.patch.object(
+            src.message_manager, 'get_broadcaster', return_value=broadcaster)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.db.cur.execute(
+            'UPDATE kaypoh_messages SET text_hash = NULL WHERE event_id = ?',
+            (self.event_id, ))
+        self.db.con.commit()
+
+    def test_unchanged_roster_skipped(self):
+        handler_cls = src.message_manager.KaypohMessageHandler
+        first = handler_cls(self.event_id).update_all_message_instances()
+        second = handler_cls(self.event_id).update_all_message_instances()
+
+        self.assertEqual(first, (1, 0, 0))
+        self.assertEqual(second, (0, 0, 1), 'roster has not changed')
+        self.assertEqual(self.bot.edits, [(self.player_id, 11)])
+
+    def test_fan_out(self):
+        watchers = [(2, 21), (3, 31), (4, 41)]
+        for player_id, message_id in watchers:
+            self.db.insert_msg_record(
+                user_id=player_id, message_id=message_id, event_id=self.event_id)
+        self.addCleanup(self._delete_watchers, watchers)
+
+        handler = src.message_manager.KaypohMessageHandler(self.event_id)
+        success, failed, skipped = handler.update_all_message_instances()
+
+        self.assertEqual((success, failed, skipped), (4, 0, 0))
+        self.assertEqual(
+            sorted(self.bot.edits), sorted(watchers + [(self.player_id, 11)]),
+            'every recipient is edited with its own message id')
+
+    def _delete_watchers(self, watchers):
+        for player_id, _ in watchers:
+            self.db.delete_msg_record(user_id=player_id, event_id=self.event_id)
+
+    def test_hash_ignores_rendered_time(self):
+        handler_cls = src.message_manager.KaypohMessageHandler
+        morning = handler_cls(self.event_id, datetime(2023, 5, 27, 9))
+        evening = handler_cls(self.event_id, datetime(2023, 5, 27, 21))
+
+        self.assertNotEqual(morning.text, evening.text)
+        self.assertEqual(morning.text_hash, evening.text_hash)
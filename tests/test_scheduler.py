@@ -0,0 +1,95 @@
+import unittest
+
+from types import SimpleNamespace
+
+from src.scheduler import DebouncedScheduler
+
+
+class FakeJob:
+    def __init__(self, callback, when, context):
+        self.callback = callback
+        self.when = when
+        self.context = context
+
+
+class FakeJobQueue:
+    """
+    runs jobs on demand against a fake clock
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.jobs = list()
+
+    def clock(self):
+        return self.now
+
+    def run_once(self, callback, when, context=None):
+        job = FakeJob(callback, self.now + when, context)
+        self.jobs.append(job)
+        return job
+
+    def run_due(self, until):
+        """
+        advance the clock to until, running every job due on the way
+        """
+        while True:
+            due = [job for job in self.jobs if job.when <= until]
+            if not due:
+                break
+            job = min(due, key=lambda job: job.when)
+            self.jobs.remove(job)
+            self.now = max(self.now, job.when)
+            job.callback(SimpleNamespace(job=job))
+        self.now = until
+
+
+class TestDebouncedScheduler(unittest.TestCase):
+    def setUp(self):
+        self.job_queue = FakeJobQueue()
+        self.refreshed = list()
+        self.scheduler = DebouncedScheduler(
+            self.refresh, window=5, max_delay=20, clock=self.job_queue.clock
+        )
+
+    def refresh(self, key):
+        self.refreshed.append((key, self.job_queue.now))
+
+    def test_requests_collapsed(self):
+        for t in range(4):
+            self.job_queue.run_due(t)
+            self.scheduler.request(1, self.job_queue)
+            self.scheduler.request(2, self.job_queue)
+
+        self.job_queue.run_due(60)
+
+        # one refresh per key, window seconds after the last request
+        self.assertEqual(self.refreshed, [(1, 8), (2, 8)])
+        self.assertEqual(self.scheduler.pending, dict())
+
+    def test_max_delay(self):
+        for t in range(0, 40, 2):
+            self.job_queue.run_due(t)
+            self.scheduler.request(1, self.job_queue)
+
+        self.job_queue.run_due(60)
+
+        # requests every 2 seconds never leave a quiet window
+        self.assertEqual(self.refreshed, [(1, 20), (1, 40)])
+
+    def test_one_refresh_in_flight(self):
+        calls = list()
+
+        def slow_refresh(key):
+            calls.append(self.job_queue.now)
+            if len(calls) == 1:
+                # attendance updated while the roster is being sent
+                self.scheduler.request(key, self.job_queue)
+                self.assertEqual(self.job_queue.jobs, [])
+
+        self.scheduler.refresh = slow_refresh
+        self.scheduler.request(1, self.job_queue)
+        self.job_queue.run_due(60)
+
+        self.assertEqual(calls, [5, 10])
+        self.assertEqual(self.scheduler.pending, dict())
@@ -0,0 +1,61 @@
+import unittest
+import os
+import tempfile
+
+import src.templates
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render(self):
+        template = src.templates.Template.parse(
+            'Hi {name}, {n} events {name}! {not a field}')
+        self.assertEqual(template.fields, {'name', 'n'})
+        self.assertEqual(template.render(name='Ann', n=2),
+                         'Hi Ann, 2 events Ann! {not a field}')
+        with self.assertRaises(KeyError):
+            template.render(name='Ann')
+
+    def test_partial(self):
+        template = src.templates.Template.parse('{a} and {b} then {a}')
+        partial = template.partial(a='x')
+        self.assertEqual(partial.fields, {'b'})
+        self.assertEqual(partial.render(b='{a}'), 'x and {a} then x')
+
+    def test_kaypoh_matches_replace(self):
+        templates = src.templates.get_templates()
+        fields = {
+            field: f"<{field}>"
+            for field in templates.get('kaypoh_msg.txt').fields
+        }
+        with open(os.path.join('resources', 'messages', 'kaypoh_msg.txt')) as f:
+            expected = f.read()
+        for field, value in fields.items():
+            expected = expected.replace('{' + field + '}', value)
+        self.assertEqual(templates.render('kaypoh_msg.txt', **fields), expected)
+
+
+class TestTemplateRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'greeting.txt')
+        with open(self.path, 'w') as f:
+            f.write('hello {name}')
+        self.registry = src.templates.TemplateRegistry(
+            self.tmp_dir.name, check_interval=0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_hot_reload(self):
+        first = self.registry.get('greeting.txt')
+        self.assertIs(self.registry.get('greeting.txt'), first,
+                      "unchanged files are not parsed again")
+
+        with open(self.path, 'w') as f:
+            f.write('bye {name}')
+        os.utime(self.path, ns=(0, first.version + 1))
+        self.assertEqual(self.registry.render('greeting.txt', name='Ann'), 'bye Ann')
+
+    def test_unknown_template(self):
+        with self.assertRaises(KeyError):
+            self.registry.get('missing.txt')
@@ -1,7 +1,11 @@
 import unittest
 import os
+import sqlite3
+import tempfile
+import threading
 
 from src.Upgrade.upgrade_manager import UpgradeManager
+import src.Upgrade.upgrade
 
 
 class TestUpgradeManager(unittest.TestCase):
@@ -59,3 +63,137 @@ class TestUpgradeManager(unittest.TestCase):
         self.assertTrue(os.path.isfile('test_config.json'),
                         "file shold be created as test_config.json")
         os.remove('test_config.json')
+
+
+class TestUpgradeScripts(unittest.TestCase):
+
+    def setUp(self):
+        self.con = sqlite3.connect(':memory:')
+        self.con.executescript(
+            """
+            CREATE TABLE attendance(
+                event_id LONGINT, player_id LONGINT, status INT, reason TEXT);
+            CREATE TABLE access_control(player_id LONGINT, control_id INT);
+            CREATE TABLE announcement_entities(
+                event_id LONGINT, entity_type TEXT,
+                offset INT, entity_length INT);
+
+            INSERT INTO attendance VALUES (1, 10, 0, 'old');
+            INSERT INTO attendance VALUES (1, 10, 1, 'new');
+            INSERT INTO attendance VALUES (2, 10, 1, '');
+            INSERT INTO access_control VALUES (10, 2);
+            INSERT INTO access_control VALUES (10, 4);
+            INSERT INTO announcement_entities VALUES (1, 'bold', 0, 5);
+            INSERT INTO announcement_entities VALUES (1, 'bold', 0, 5);
+            INSERT INTO announcement_entities VALUES (1, 'italic', 6, 5);
+            """)
+
+    def tearDown(self):
+        self.con.close()
+
+    def test_upgrade_2_12_deduplicates(self):
+        src.Upgrade.upgrade.upgrade_2_12(self.con)
+
+        attendance = self.con.execute(
+            'SELECT status, reason FROM attendance WHERE event_id = 1').fetchall()
+        access = self.con.execute(
+            'SELECT control_id FROM access_control').fetchall()
+        entities = self.con.execute(
+            'SELECT * FROM announcement_entities').fetchall()
+
+        self.assertEqual(attendance, [(1, 'new')], 'latest row should be kept')
+        self.assertEqual(access, [(4, )])
+        self.assertEqual(len(entities), 2)
+
+    def test_upgrade_2_12_unique_indexes(self):
+        src.Upgrade.upgrade.upgrade_2_12(self.con)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.con.execute('INSERT INTO attendance VALUES (2, 10, 0, NULL)')
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.con.execute('INSERT INTO access_control VALUES (10, 5)')
+
+    def test_upgrade_2_12_rerun(self):
+        src.Upgrade.upgrade.upgrade_2_12(self.con)
+        src.Upgrade.upgrade.upgrade_2_12(self.con)
+        n_rows = self.con.execute('SELECT COUNT(*) FROM attendance').fetchone()
+        self.assertEqual(n_rows, (2, ))
+
+    def test_upgrade_2_13_change_log(self):
+        self.con.executescript(
+            """
+            CREATE TABLE players(id LONGINT);
+            CREATE TABLE events(id LONGINT);
+            CREATE TABLE access_control_description(id INT, description TEXT);
+            """)
+        src.Upgrade.upgrade.upgrade_2_12(self.con)
+        src.Upgrade.upgrade.upgrade_2_13(self.con)
+        src.Upgrade.upgrade.upgrade_2_13(self.con)
+
+        self.con.execute('UPDATE attendance SET event_id = 3 WHERE event_id = 2')
+        self.con.commit()
+
+        versions = dict(self.con.execute('SELECT * FROM change_log'))
+        event_versions = dict(
+            self.con.execute('SELECT * FROM attendance_versions'))
+        self.assertEqual(set(versions), set(src.Upgrade.upgrade.TRACKED_TABLES))
+        self.assertEqual(versions['attendance'], 1)
+        self.assertEqual(versions['events'], 0)
+        self.assertEqual(event_versions, {2: 1, 3: 1})
+
+    def test_upgrade_2_14_text_hash(self):
+        src.Upgrade.upgrade.upgrade_2_12(self.con)
+        src.Upgrade.upgrade.upgrade_2_14(self.con)
+        src.Upgrade.upgrade.upgrade_2_14(self.con)
+
+        columns = [row[1] for row in self.con.execute('PRAGMA table_info(kaypoh_messages)')]
+        self.assertEqual(columns, ['player_id', 'message_id', 'event_id', 'text_hash'])
+
+    def test_upgrade_waits_for_writer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, 'locked.db')
+            writer = sqlite3.connect(database, check_same_thread=False)
+            writer.executescript(
+                """
+                PRAGMA journal_mode = WAL;
+                CREATE TABLE kaypoh_messages(
+                    player_id LONGINT, message_id LONGINT, event_id LONGINT);
+                BEGIN IMMEDIATE;
+                INSERT INTO kaypoh_messages VALUES (1, 1, 1);
+                """)
+            release = threading.Timer(0.2, writer.commit)
+            release.start()
+
+            con = sqlite3.connect(database, timeout=5)
+            # would fail with a stale snapshot if the upgrade read before locking
+            src.Upgrade.upgrade.upgrade_2_14(con)
+            release.join()
+
+            columns = [row[1] for row in con.execute('PRAGMA table_info(kaypoh_messages)')]
+            self.assertIn('text_hash', columns)
+            self.assertEqual(
+                con.execute('SELECT COUNT(*) FROM kaypoh_messages').fetchone(), (1, ))
+            con.close()
+            writer.close()
+
+    def test_created_matches_upgraded(self):
+        self.con.executescript(
+            """
+            CREATE TABLE players(id LONGINT);
+            CREATE TABLE events(id LONGINT);
+            CREATE TABLE access_control_description(id INT, description TEXT);
+            """)
+        for version, upgrade in src.Upgrade.upgrade.UPGRADES:
+            if version > 2.11:
+                upgrade(self.con)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            created = src.Upgrade.upgrade.create_database(
+                os.path.join(tmp_dir, 'created.db'))
+            for query in ("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'",
+                          "SELECT table_name FROM change_log",
+                          "PRAGMA table_info(kaypoh_messages)"):
+                self.assertEqual(
+                    sorted(created.execute(query).fetchall()),
+                    sorted(self.con.execute(query).fetchall()),
+                    query)
+            created.close()
@@ -0,0 +1,35 @@
+import unittest
+
+import src.utils as utils
+
+
+class TestDateButtons(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.data = [
+            {'id': 202306071930 + day * 10000, 'event_type': 'Field Training'}
+            for day in range(7)
+        ]
+
+    def test_labels(self):
+        button = utils.date_button(202306071930, 'Field Training')
+        self.assertEqual(button.text, '7-Jun-23, Wed (Field Training)')
+        self.assertEqual(button.callback_data, '202306071930')
+        self.assertIs(utils.date_button(202306071930, 'Field Training'), button,
+                      "buttons are built once per event")
+        self.assertEqual(utils.date_time_label(202306071930), '7-Jun-23, Wed @ 7:30PM')
+
+    def test_pages(self):
+        first = utils.date_buttons(self.data, 0)
+        second = utils.date_buttons(self.data, 1)
+
+        self.assertEqual(len(first), 6)
+        self.assertEqual(first[-1], [utils.NEXT_BUTTON])
+        self.assertEqual(len(second), 3)
+        self.assertEqual(second[-1], [utils.PREV_BUTTON])
+        self.assertEqual(second[0][0].callback_data, str(self.data[5]['id']))
+
+    def test_no_pages(self):
+        buttons = utils.date_buttons(self.data, pages=False)
+        self.assertEqual([row[0].callback_data for row in buttons],
+                         [str(row['id']) for row in self.data])
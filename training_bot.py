@@ -1,15 +1,19 @@
 import logging
-import os
 import json
-import sqlite3
 import src.utils as utils
 import src.Upgrade.upgrade_manager
+import src.Database.sqlite
+import src.Database.connection
+import src.Database.executor
 
 from datetime import datetime
 from functools import wraps
 from src.user_manager import UserManager
-from src.event_manager import TrainingEventManager, AttendanceManager
+from src.event_manager import TrainingEventManager, AttendanceManager, pull_training_events
 from src.message_manager import KaypohMessage, KaypohMessageHandler
+from src.templates import get_templates
+from src.bot_clients import get_bot, training_bot_token
+from src.scheduler import DebouncedScheduler
 
 from telegram import (
         Update,
@@ -19,7 +23,7 @@ from telegram import (
         ChatAction,
         MessageEntity,
         )
-from telegram.bot import Bot, BotCommand
+from telegram.bot import BotCommand
 from telegram.ext import (
         Updater,
         CommandHandler,
@@ -32,7 +36,6 @@ from telegram.ext import (
 
 with open("config.json") as f:
     CONFIG = json.load(f)
-    db = sqlite3.connect(CONFIG['database'], check_same_thread=False)
 
 # enable logging
 logging.basicConfig(
@@ -40,6 +43,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# runs db reads off the dispatcher thread, writes are serialized on one thread
+db_executor = src.Database.executor.get_executor()
+
 
 # typing wrapper
 def send_typing_action(func):
@@ -181,8 +187,9 @@ def attendance_list(update: Update, context: CallbackContext) -> int:
     # retrieve selected event
     event_id = int(query.data)
 
-    message_instance = KaypohMessage(event_id)
-    message_instance.fill_text_fields(datetime.now())
+    with src.Database.sqlite.snapshot():
+        message_instance = KaypohMessage(event_id)
+        message_instance.fill_text_fields(datetime.now())
 
     bot_message = query.edit_message_text(
             text=message_instance.text, parse_mode='html'
@@ -203,11 +210,13 @@ def indicate_attendance(update: Update, context: CallbackContext) -> int:
     if not date_chosen:
         # retrieve date query and store
         selected_event = int(query.data)
-        event_instance = TrainingEventManager(selected_event)
         user_instance = context.user_data['user_instance']
 
-        # retrieve data
-        attendance = AttendanceManager(user_instance.id, event_instance.id)
+        # retrieve event and attendance concurrently
+        event_instance, attendance = db_executor.gather(
+                db_executor.read(TrainingEventManager, selected_event),
+                db_executor.read(AttendanceManager, user_instance.id, selected_event),
+                )
         attach_reason = False
 
         # store attendance into context
@@ -321,7 +330,7 @@ def update_attendance(update: Update, context: CallbackContext) -> str:
     if attendance.is_attending():
         bot_comment = f"See you at {event_instance.event_type}! 🦾🦾"
     attendance.update_records()
-    context.job_queue.run_once(update_kaypoh_messages, 0, context=event_instance)
+    kaypoh_refresher.request(event_instance.id, context.job_queue)
     event_date = event_instance.get_event_date().strftime('%-d %b, %a')
 
     text = f"""
@@ -362,18 +371,30 @@ Attendance: {'Yes' if attendance.status else 'No'}
     return ConversationHandler.END
 
 
-def update_kaypoh_messages(context: CallbackContext):
+def update_kaypoh_messages(event_id: int):
     logger.info("intitiating job queue to update kaypoh messages....")
-    event_instance = context.job.context
-    message_handler = KaypohMessageHandler(event_instance.id)
-    success, failed = message_handler.update_all_message_instances()
+    try:
+        message_handler = KaypohMessageHandler(event_id)
+        success, failed, skipped = message_handler.update_all_message_instances()
+    finally:
+        # job queue threads hand their connection back between runs
+        src.Database.connection.release_thread_connections()
     n_records = message_handler.n_records()
     logger.info(
-            "completed job queue updating messages for %d records: (%d successful, %d failed)",
-            n_records, success, failed
+            "completed job queue updating messages for %d records: "
+            "(%d successful, %d failed, %d unchanged)",
+            n_records, success, failed, skipped
             )
 
 
+# attendance changes within the window are collapsed into one refresh per event
+kaypoh_refresher = DebouncedScheduler(
+        update_kaypoh_messages,
+        window=CONFIG.get('kaypoh_refresh', dict()).get('window', 5),
+        max_delay=CONFIG.get('kaypoh_refresh', dict()).get('max_delay', 30)
+        )
+
+
 @secure(access=4)
 @send_typing_action
 def choosing_more_dates(update: Update, context: CallbackContext) -> int:
@@ -437,7 +458,7 @@ def choosing_more_dates_cont(update: Update, context: CallbackContext) -> int:
 
     text = ''
     for element in chosen_events:
-        text += datetime.strptime(str(element), '%Y%m%d%H%M').strftime('%-d-%b-%-y, %a @ %-I:%M%p') + "\n"
+        text += utils.date_time_label(element) + "\n"
 
     # make buttons
     buttons = utils.date_buttons(event_data, pages=False)
@@ -536,13 +557,13 @@ def commit_attendance_plus(update: Update, context: CallbackContext) -> int:
 
     date_strs = list()
 
-    for event_id in chosen_events:
-        event = TrainingEventManager(event_id)
-        attendance = AttendanceManager(user_instance.id, event.id)
-        attendance.set_status(status)
-        attendance.set_reason(reason)
-        attendance.update_records()
-        context.job_queue.run_once(update_kaypoh_messages, 0, context=event)
+    chosen_event_instances = pull_training_events(chosen_events)
+    user_instance.push_many_attendance(
+            [event.id for event in chosen_event_instances], status, reason
+            )
+
+    for event in chosen_event_instances:
+        kaypoh_refresher.request(event.id, context.job_queue)
         event_date = event.get_event_date()
         pretty_str = event_date.strftime('%-d %b, %a @ %-I:%M%p')
         pretty_str = f"{pretty_str} ({event.event_type})"
@@ -598,27 +619,25 @@ def generate_ics(update: Update, context: CallbackContext) -> int:
     event_id = int(query.data)
 
     user = update.effective_user
-    with sqlite3.connect(CONFIG['database']) as db:
-        db.row_factory = sqlite3.Row
-        event_data = db.execute("SELECT * FROM events WHERE id = ? ", (event_id, )).fetchone()
-        event_date = datetime.strptime(str(event_id), "%Y%m%d%H%M")
-
-        # text formatting
-        training_date = event_date.strftime("%-d %b, %a")
-        start_time= event_date.strftime("%-I:%M%p")
-        end_time = datetime.strptime(event_data["end_time"], "%H:%M").strftime("%-I:%M%p")
-
-        # calendar formatting
-        # calendar_start= event_date.strftime("%Y-%m-%d %H:M%S")
-        # calendar_end = event_date.strftime("%Y-%m-%d") + event_data["end_time"] + ":00"
-        # calendar = Calendar()
-        # calendar_event = Event(
-        #        name=f"Alliance {event_data['event_type']}",
-        #        begin=event_date.strftime("%Y-%m-%d %H:%M:%S"),
-        #        end=event_date.strftime("%Y-%m-%d") + " " + event_data["end_time"] + ":00",
-        #        location = event_data['location']
-        #        )
-        # calendar.events.add(calendar_event)
+    event_data = src.Database.sqlite.EventsTableSqlite().get_event_by_id(event_id)
+    event_date = datetime.strptime(str(event_id), "%Y%m%d%H%M")
+
+    # text formatting
+    training_date = event_date.strftime("%-d %b, %a")
+    start_time= event_date.strftime("%-I:%M%p")
+    end_time = datetime.strptime(event_data["end_time"], "%H:%M").strftime("%-I:%M%p")
+
+    # calendar formatting
+    # calendar_start= event_date.strftime("%Y-%m-%d %H:M%S")
+    # calendar_end = event_date.strftime("%Y-%m-%d") + event_data["end_time"] + ":00"
+    # calendar = Calendar()
+    # calendar_event = Event(
+    #        name=f"Alliance {event_data['event_type']}",
+    #        begin=event_date.strftime("%Y-%m-%d %H:%M:%S"),
+    #        end=event_date.strftime("%Y-%m-%d") + " " + event_data["end_time"] + ":00",
+    #        location = event_data['location']
+    #        )
+    # calendar.events.add(calendar_event)
     text = f"""
 <u>Details</u>
 Date: {event_date.strftime('%-d %b, %a')}
@@ -823,8 +842,7 @@ def select_gender(update: Update, context: CallbackContext) -> int:
     context.user_data['user_instance'] = user_instance
 
     logger.info("user %s is registering", user.first_name)
-    with open(os.path.join('resources', 'messages', 'registration_introduction.txt')) as f:
-        text = f.read()
+    text = get_templates().render('registration_introduction.txt')
     buttons = [
             [InlineKeyboardButton(text='Male 👦🏻', callback_data='Male')],
             [InlineKeyboardButton(text='Female 👩🏻', callback_data='Female')]
@@ -977,17 +995,11 @@ def cancel(update: Update, context: CallbackContext) -> int:
 
 
 def main():
-    with open(os.path.join(".secrets", "bot_credentials.json"), "r") as f:
-        bot_tokens = json.load(f)
-
-    if CONFIG["development"]:
-        token = bot_tokens["dev_bot"]
-    else:
-        token = bot_tokens["training_bot"]
+    token = training_bot_token()
 
     # upgrade if there is
     version = src.Upgrade.upgrade_manager.UpgradeManager(
-            config=CONFIG, cur_ver=2.11
+            config=CONFIG, cur_ver=2.14
             )
     updated = version.update_system()
     if updated:
@@ -1008,9 +1020,12 @@ def main():
             BotCommand("cancel", "cancel any process"),
             ]
 
-    Bot(token).set_my_commands(commands)
+    get_bot(token).set_my_commands(commands)
 
-    updater = Updater(token)
+    # every worker may hold a db connection
+    workers = CONFIG.get('bot_workers', 4)
+    src.Database.connection.check_pool_size(workers)
+    updater = Updater(bot=get_bot(token), workers=workers)
 
     # dispatcher to register handlers
     dispatcher = updater.dispatcher
@@ -1030,6 +1045,7 @@ def main():
                     ],
                 },
             fallbacks=[CommandHandler("cancel", cancel)],
+            run_async=True,
             )
 
     conv_handler_kaypoh = ConversationHandler(
@@ -1041,6 +1057,7 @@ def main():
                     ],
                 },
             fallbacks=[CommandHandler("cancel", cancel)],
+            run_async=True,
             )
 
     conv_handler_mass_attendance = ConversationHandler(
@@ -1058,6 +1075,7 @@ def main():
                     ],
                 },
             fallbacks=[CommandHandler("cancel", cancel)],
+            run_async=True,
             )
     
     conv_handler_save_event = ConversationHandler(
@@ -1069,6 +1087,7 @@ def main():
                     ],
                 },
             fallbacks=[CommandHandler("cancel", cancel)],
+            run_async=True,
             )
 
     conv_handler_settings = ConversationHandler(
@@ -1087,6 +1106,7 @@ def main():
                 ],
             },
             fallbacks=[CommandHandler('cancel', cancel)],
+            run_async=True,
                         )
 
     conv_handler_register = ConversationHandler(
@@ -1104,6 +1124,7 @@ def main():
                     ],
                 },
             fallbacks=[CommandHandler('cancel', cancel)],
+            run_async=True,
             )
     # conv_handler_apply_members = ConversationHandler(
     #         entry_points=[CommandHandler("apply_membership", review_membership)],
@@ -1115,11 +1136,11 @@ def main():
     #         fallbacks=[CommandHandler('cancel', cancel)]
     #         )
     #
-    dispatcher.add_handler(CommandHandler("start", start))
+    dispatcher.add_handler(CommandHandler("start", start, run_async=True))
     dispatcher.add_handler(conv_handler_attendance)
     dispatcher.add_handler(conv_handler_kaypoh)
     dispatcher.add_handler(conv_handler_mass_attendance)
-    dispatcher.add_handler(CommandHandler("events", events))
+    dispatcher.add_handler(CommandHandler("events", events, run_async=True))
     dispatcher.add_handler(conv_handler_register)
     dispatcher.add_handler(conv_handler_save_event)
     dispatcher.add_handler(conv_handler_settings)